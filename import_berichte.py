@@ -6,11 +6,20 @@ PDF-Annotator-Installation (Production-Datenbank).
 Verzeichnisstruktur: Nachname_Vorname/Datei.pdf
 """
 
+import io
+import os
 import shutil
 import sqlite3
 import sys
+from concurrent.futures import Future, ThreadPoolExecutor
 from pathlib import Path
-from uuid import uuid4
+from typing import NamedTuple
+from uuid import UUID
+
+try:
+    import fitz  # type: ignore
+except ImportError:  # PyMuPDF fehlt: Seitenanzahl faellt auf 1 zurueck
+    fitz = None
 
 SOURCE_DIR = Path(
     "/Users/java/Library/Mobile Documents/com~apple~CloudDocs"
@@ -23,6 +32,44 @@ DB_PATH = DATA_DIR / "annotations.db"
 
 SUBJECT = "Praxisbericht"
 
+# Worker fuer das Kopieren (gibt den GIL frei, die Kopie laeuft im Kernel).
+# PyMuPDF ist nicht thread-sicher und gibt den GIL nicht frei: Seitenzaehlen
+# und SQLite-Arbeit bleiben im Hauptthread.
+IMPORT_WORKERS = os.cpu_count() or 4
+
+# Zeilen pro executemany-Aufruf beim abschliessenden Schreiben der Dokumente
+INSERT_BATCH_SIZE = 1000
+
+# Fester SQL-Text: identische Strings treffen den Statement-Cache von sqlite3,
+# das Statement wird so nur einmal pro Lauf vorbereitet.
+# Leere Annotationen werden bewusst nicht angelegt: Die App behandelt eine
+# fehlende Zeile wie eine leere Notiz und legt sie beim ersten Speichern an
+# (upsert_annotation).
+SQL_INSERT_DOC = """
+    INSERT INTO documents
+        (id, original_filename, file_path, page_count,
+         first_name, last_name, title, year, subject)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+# Parameter einer Zeile fuer SQL_INSERT_DOC
+DocRow = tuple[str, str, str, int, str, str, str, str, str]
+
+
+class ImportJob(NamedTuple):
+    """Eine geplante Datei aus Phase 1 von main().
+
+    pdf_entry ist None fuer Verzeichnisse ohne PDF; copied ist None fuer
+    Duplikate (Name bereits importiert oder in diesem Lauf schon kopiert),
+    sonst die Kopie im Worker-Pool.
+    """
+
+    subdir: os.DirEntry[str]
+    pdf_entry: os.DirEntry[str] | None = None
+    doc_id: str = ""
+    storage_path: str = ""
+    copied: Future[str] | None = None
+
 
 def parse_name(dir_name: str) -> tuple[str, str]:
     """Parst Verzeichnisname in (Nachname, Vorname).
@@ -46,81 +93,120 @@ def parse_name(dir_name: str) -> tuple[str, str]:
     return last_name, first_name
 
 
-def get_page_count(pdf_path: Path) -> int:
-    """Ermittelt Seitenanzahl via PyMuPDF."""
-    try:
-        import fitz  # type: ignore
+def get_page_count(pdf_path: str) -> int:
+    """Ermittelt Seitenanzahl via PyMuPDF.
 
-        doc = fitz.open(str(pdf_path))
-        count = doc.page_count
-        doc.close()
-        return count
+    filetype="pdf" ueberspringt die Formaterkennung; page_count liest nur den
+    Seitenbaum, ohne eine einzelne Seite zu laden.
+    """
+    if fitz is None:
+        print("  Warnung: PyMuPDF nicht installiert, Seitenanzahl wird auf 1 gesetzt")
+        return 1
+    try:
+        with fitz.open(pdf_path, filetype="pdf") as doc:
+            return doc.page_count
     except Exception as e:
         print(f"  Warnung: Seitenanzahl konnte nicht ermittelt werden: {e}")
         return 1
 
 
-def document_already_imported(conn: sqlite3.Connection, original_filename: str) -> bool:
+def load_existing_filenames(conn: sqlite3.Connection) -> set[str]:
+    """Laedt alle bereits importierten Dateinamen in einem einzigen SELECT."""
+    return {row[0] for row in conn.execute("SELECT original_filename FROM documents")}
+
+
+def document_already_imported(existing: set[str], original_filename: str) -> bool:
     """Prueft ob eine Datei mit diesem Namen bereits importiert wurde."""
-    cursor = conn.cursor()
-    cursor.execute(
-        "SELECT id FROM documents WHERE original_filename = ?",
-        (original_filename,),
-    )
-    return cursor.fetchone() is not None
+    return original_filename in existing
 
 
-def import_pdf(conn: sqlite3.Connection, pdf_path: Path, dir_name: str) -> str | None:
-    """Importiert eine PDF-Datei und gibt die doc_id zurueck."""
-    original_filename = pdf_path.name
+def new_ids() -> tuple[str, str]:
+    """Erzeugt (storage_id, doc_id) als UUID4 aus einem einzigen os.urandom-Aufruf."""
+    raw = os.urandom(32)
+    return str(UUID(bytes=raw[:16], version=4)), str(UUID(bytes=raw[16:], version=4))
 
-    if document_already_imported(conn, original_filename):
-        print(f"  Uebersprungen (bereits vorhanden): {original_filename}")
-        return None
 
+def document_row(
+    pdf_entry: os.DirEntry[str],
+    dir_name: str,
+    doc_id: str,
+    storage_path: str,
+    page_count: int,
+) -> DocRow:
+    """Baut die Parameter fuer SQL_INSERT_DOC zu einer bereits kopierten PDF-Datei."""
     last_name, first_name = parse_name(dir_name)
-    page_count = get_page_count(pdf_path)
+    return (
+        doc_id,
+        pdf_entry.name,
+        storage_path,
+        page_count,
+        first_name,
+        last_name,
+        "",
+        "",
+        SUBJECT,
+    )
 
-    # UUID-Dateiname fuer den Upload-Ordner
-    storage_id = str(uuid4())
-    storage_filename = f"{storage_id}.pdf"
-    storage_path = UPLOAD_DIR / storage_filename
 
-    shutil.copy2(str(pdf_path), str(storage_path))
+def insert_documents(
+    conn: sqlite3.Connection, rows: list[DocRow]
+) -> tuple[list[DocRow], int]:
+    """Schreibt rows blockweise; gibt (geschriebene Zeilen, Anzahl Fehler) zurueck.
 
-    doc_id = str(uuid4())
+    Jeder Block laeuft in einem SAVEPOINT. Scheitert er, wird er
+    zurueckgerollt und Zeile fuer Zeile wiederholt, sodass wie beim
+    zeilenweisen Import nur die fehlerhafte Datei verloren geht; deren Kopie
+    im Upload-Ordner wird geloescht. Muss in einer Transaktion laufen.
+    """
     cursor = conn.cursor()
-    cursor.execute(
-        """
-        INSERT INTO documents
-            (id, original_filename, file_path, page_count,
-             first_name, last_name, title, year, subject)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """,
-        (
-            doc_id,
-            original_filename,
-            str(storage_path),
-            page_count,
-            first_name,
-            last_name,
-            "",
-            "",
-            SUBJECT,
-        ),
-    )
+    written: list[DocRow] = []
+    errors = 0
+    for start in range(0, len(rows), INSERT_BATCH_SIZE):
+        batch = rows[start : start + INSERT_BATCH_SIZE]
+        conn.execute("SAVEPOINT import_batch")
+        try:
+            cursor.executemany(SQL_INSERT_DOC, batch)
+        except sqlite3.Error:
+            conn.execute("ROLLBACK TO import_batch")
+        else:
+            written.extend(batch)
+            conn.execute("RELEASE import_batch")
+            continue
+        conn.execute("RELEASE import_batch")
+
+        for row in batch:
+            conn.execute("SAVEPOINT import_pdf")
+            try:
+                cursor.execute(SQL_INSERT_DOC, row)
+            except sqlite3.Error as e:
+                conn.execute("ROLLBACK TO import_pdf")
+                print(f"[FEHLER] {row[1]}: {e}")
+                errors += 1
+                remove_copy(row[2])
+            else:
+                written.append(row)
+            conn.execute("RELEASE import_pdf")
+    return written, errors
 
-    for page_num in range(1, page_count + 1):
-        cursor.execute(
-            """
-            INSERT INTO annotations (doc_id, page_number, note_text)
-            VALUES (?, ?, ?)
-            """,
-            (doc_id, page_num, ""),
-        )
 
-    conn.commit()
-    return doc_id
+def submit_copy(
+    pool: ThreadPoolExecutor, pdf_entry: os.DirEntry[str], upload_dir: str
+) -> tuple[str, str, Future[str]]:
+    """Startet die Kopie einer PDF unter einem UUID-Dateinamen im Upload-Ordner.
+
+    Gibt (doc_id, storage_path, Future der Kopie) zurueck.
+    """
+    storage_id, doc_id = new_ids()
+    storage_path = os.path.join(upload_dir, f"{storage_id}.pdf")
+    return doc_id, storage_path, pool.submit(shutil.copy2, pdf_entry.path, storage_path)
+
+
+def remove_copy(storage_path: str) -> None:
+    """Loescht eine Kopie im Upload-Ordner, zu der es keine Datenbankzeile gibt."""
+    try:
+        os.unlink(storage_path)
+    except FileNotFoundError:
+        pass
 
 
 def main() -> None:
@@ -129,42 +215,135 @@ def main() -> None:
         sys.exit(1)
 
     UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
+    # Im Schleifenrumpf nur noch mit str-Pfaden arbeiten (kein Path pro Datei)
+    upload_dir = os.fspath(UPLOAD_DIR)
 
-    conn = sqlite3.connect(str(DB_PATH))
+    # Autocommit-Modus: Transaktionen werden unten explizit gesteuert
+    conn = sqlite3.connect(str(DB_PATH), isolation_level=None, cached_statements=256)
     conn.execute("PRAGMA foreign_keys = ON")
+    # Bulk-Import-Einstellungen. Gelten nur fuer diese Verbindung des
+    # Import-Skripts; die Verbindungen der App bleiben unberuehrt
+    # (journal_mode=WAL ist ohnehin der Modus der App).
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    conn.execute("PRAGMA cache_size=-65536")  # 64 MB Page-Cache
+
+    existing = load_existing_filenames(conn)
 
-    imported = 0
     skipped = 0
     errors = 0
 
-    subdirs = sorted(
-        d for d in SOURCE_DIR.iterdir() if d.is_dir() and d.name != "venv"
-    )
+    # os.scandir statt iterdir()/glob(): DirEntry cached die stat-Infos, was
+    # auf dem iCloud-Pfad viele langsame Syscalls spart
+    with os.scandir(SOURCE_DIR) as it:
+        subdirs = sorted(
+            (e for e in it if e.is_dir(follow_symlinks=False) and e.name != "venv"),
+            key=lambda e: e.name,
+        )
+
+    # Am Terminal ist stdout zeilengepuffert (ein write() pro print). Waehrend
+    # des Imports stattdessen voll puffern und einmal pro Verzeichnis leeren.
+    if isinstance(sys.stdout, io.TextIOWrapper):
+        sys.stdout.reconfigure(line_buffering=False)
 
     print(f"Verarbeite {len(subdirs)} Verzeichnisse aus:\n  {SOURCE_DIR}\n")
 
-    for subdir in subdirs:
-        pdfs = list(subdir.glob("*.pdf"))
-        if not pdfs:
-            print(f"[SKIP] {subdir.name}: Keine PDF-Datei gefunden")
-            skipped += 1
-            continue
+    with ThreadPoolExecutor(max_workers=IMPORT_WORKERS) as pool:
+        # Phase 1: Verzeichnisse scannen und jede neue Datei sofort an den
+        # Pool uebergeben (nur die Kopie). Die Kopien laufen dadurch parallel
+        # zueinander und zum Seitenzaehlen in Phase 2.
+        jobs: list[ImportJob] = []
+        claimed: set[str] = set()  # in diesem Lauf zur Kopie uebergebene Namen
+        for subdir in subdirs:
+            with os.scandir(subdir.path) as it:
+                # Wie zuvor glob("*.pdf"): Endung case-sensitiv
+                pdfs = [e for e in it if e.is_file() and e.name.endswith(".pdf")]
+            if not pdfs:
+                jobs.append(ImportJob(subdir))
+                continue
+
+            for pdf_entry in pdfs:
+                # Auch Duplikate innerhalb desselben Laufs erkennen: nur die
+                # erste Datei eines Namens wird kopiert. Ob sie importiert
+                # ist, steht erst nach der Kopie fest (Phase 2).
+                if (
+                    document_already_imported(existing, pdf_entry.name)
+                    or pdf_entry.name in claimed
+                ):
+                    jobs.append(ImportJob(subdir, pdf_entry))
+                    continue
+                claimed.add(pdf_entry.name)
+
+                doc_id, storage_path, copied = submit_copy(pool, pdf_entry, upload_dir)
+                jobs.append(ImportJob(subdir, pdf_entry, doc_id, storage_path, copied))
+
+        # Phase 2: Kopien in Scan-Reihenfolge einsammeln und die Seiten in der
+        # frischen lokalen Kopie zaehlen (statt auf dem iCloud-Quellpfad), im
+        # Hauptthread. Fehler beim Kopieren betreffen nur die jeweilige Datei.
+        docs_rows: list[DocRow] = []
+        current_subdir = None
+        for subdir, pdf_entry, doc_id, storage_path, copied in jobs:
+            if subdir is not current_subdir:
+                sys.stdout.flush()
+                current_subdir = subdir
+
+            if pdf_entry is None:
+                print(f"[SKIP] {subdir.name}: Keine PDF-Datei gefunden")
+                skipped += 1
+                continue
 
-        for pdf_path in pdfs:
             last_name, first_name = parse_name(subdir.name)
-            print(f"[IMPORT] {subdir.name}/{pdf_path.name}  ({last_name}, {first_name})")
-            try:
-                doc_id = import_pdf(conn, pdf_path, subdir.name)
-                if doc_id:
-                    imported += 1
-                    print(f"  -> doc_id: {doc_id}")
-                else:
+            print(
+                f"[IMPORT] {subdir.name}/{pdf_entry.name}  ({last_name}, {first_name})"
+            )
+            if copied is None:
+                if document_already_imported(existing, pdf_entry.name):
+                    print(f"  Uebersprungen (bereits vorhanden): {pdf_entry.name}")
                     skipped += 1
+                    continue
+                # Die Kopie der ersten Datei dieses Namens ist gescheitert:
+                # diese Datei stattdessen kopieren
+                doc_id, storage_path, copied = submit_copy(pool, pdf_entry, upload_dir)
+
+            try:
+                copied.result()
             except Exception as e:
                 print(f"  FEHLER: {e}")
                 errors += 1
-
-    conn.close()
+                remove_copy(storage_path)  # ggf. unvollstaendige Kopie
+                continue
+            # Erst eine erfolgreiche Kopie macht spaetere Dateien gleichen
+            # Namens zu Duplikaten
+            existing.add(pdf_entry.name)
+            page_count = get_page_count(storage_path)
+
+            docs_rows.append(
+                document_row(pdf_entry, subdir.name, doc_id, storage_path, page_count)
+            )
+        sys.stdout.flush()
+
+    # Phase 3: Alle Dokumente in einer Transaktion (ein fsync statt einem pro
+    # PDF) mit executemany schreiben. Die SQLite-Verbindung wird nur aus
+    # diesem (Haupt-)Thread benutzt.
+    conn.execute("BEGIN")
+    try:
+        written, failed = insert_documents(conn, docs_rows)
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        # Ohne Datenbankzeilen waeren die Kopien verwaiste Dateien
+        for row in docs_rows:
+            remove_copy(row[2])
+        raise
+    finally:
+        conn.close()
+
+    # Erst nach dem Commit als importiert melden
+    for doc_id, original_filename, *_ in written:
+        print(f"[OK] {original_filename} -> doc_id: {doc_id}")
+    imported = len(written)
+    errors += failed
 
     print(f"\nFertig: {imported} importiert, {skipped} uebersprungen, {errors} Fehler")
 
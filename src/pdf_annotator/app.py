@@ -7,7 +7,7 @@ Creates and configures Flask application with all routes and settings.
 import os
 from typing import Any
 
-from flask import Flask, jsonify
+from flask import Flask, jsonify, render_template
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
 from flask_login import LoginManager
@@ -24,6 +24,22 @@ from pdf_annotator.routes.swb import swb_bp
 from pdf_annotator.routes.upload import upload_bp
 from pdf_annotator.routes.viewer import viewer_bp
 from pdf_annotator.utils.logger import setup_logger
+from pdf_annotator.utils.uploads import UploadRequest
+
+# Security headers added to every response (built once, merged per response)
+SECURITY_HEADERS = {
+    "X-Content-Type-Options": "nosniff",
+    "X-Frame-Options": "DENY",
+    "X-XSS-Protection": "1; mode=block",
+    "Referrer-Policy": "strict-origin-when-cross-origin",
+    "Content-Security-Policy": (
+        "default-src 'self'; "
+        "script-src 'self' 'unsafe-inline'; "
+        "style-src 'self' 'unsafe-inline'; "
+        "img-src 'self' data: blob:; "
+        "font-src 'self' data:"
+    ),
+}
 
 
 def create_app(config_name: str | None = None) -> Flask:
@@ -47,6 +63,7 @@ def create_app(config_name: str | None = None) -> Flask:
 
     # Create Flask app
     app = Flask(__name__, template_folder="templates", static_folder="static")
+    app.request_class = UploadRequest
 
     # Load configuration
     app.config.from_object(config[config_name])
@@ -95,12 +112,13 @@ def create_app(config_name: str | None = None) -> Flask:
         get_remote_address,
         app=app,
         default_limits=["200 per minute"],
-        storage_uri="memory://",
+        storage_uri=app.config["RATELIMIT_STORAGE_URI"],
     )
 
     # Initialize database
     db = DatabaseManager(app.config["DATABASE_PATH"])
     db.init_db()
+    db.exec_pragmas(app.config["DATABASE_PRAGMAS"])
     logger.info("Database initialized")
 
     # Register blueprints
@@ -142,25 +160,13 @@ def create_app(config_name: str | None = None) -> Flask:
     @app.after_request
     def set_security_headers(response):
         """Add security headers to all responses."""
-        response.headers["X-Content-Type-Options"] = "nosniff"
-        response.headers["X-Frame-Options"] = "DENY"
-        response.headers["X-XSS-Protection"] = "1; mode=block"
-        response.headers["Referrer-Policy"] = "strict-origin-when-cross-origin"
-        response.headers["Content-Security-Policy"] = (
-            "default-src 'self'; "
-            "script-src 'self' 'unsafe-inline'; "
-            "style-src 'self' 'unsafe-inline'; "
-            "img-src 'self' data: blob:; "
-            "font-src 'self' data:"
-        )
+        response.headers.update(SECURITY_HEADERS)
         return response
 
     # Error handlers
     @app.errorhandler(404)
     def not_found(e: Any) -> tuple:
         """Handle 404 errors."""
-        from flask import render_template
-
         return (
             render_template(
                 "error.html",
@@ -173,8 +179,6 @@ def create_app(config_name: str | None = None) -> Flask:
     @app.errorhandler(500)
     def internal_error(e: Any) -> tuple:
         """Handle 500 errors."""
-        from flask import render_template
-
         logger.error(f"Internal server error: {e}", exc_info=True)
         return (
             render_template(
@@ -185,12 +189,11 @@ def create_app(config_name: str | None = None) -> Flask:
             500,
         )
 
+    max_size_mb = app.config["MAX_CONTENT_LENGTH"] / (1024 * 1024)
+
     @app.errorhandler(413)
     def request_entity_too_large(e: Any) -> tuple:
         """Handle file too large errors."""
-        from flask import render_template
-
-        max_size_mb = app.config["MAX_CONTENT_LENGTH"] / (1024 * 1024)
         return (
             render_template(
                 "error.html",
@@ -213,6 +216,10 @@ def run_server(host: str = "0.0.0.0", port: int = 8000) -> None:
 
     Note:
         Use with Gunicorn: gunicorn --workers 4 --bind 0.0.0.0:8000 pdf_annotator.app:run_server
+
+        With more than one worker, set RATELIMIT_STORAGE_URI to a shared
+        backend (e.g. redis://localhost:6379/0); the default in-memory storage
+        counts per worker process.
     """
     app = create_app("production")
     app.run(host=host, port=port, debug=False)
@@ -108,6 +108,12 @@ class Config:
     EXPORT_FOLDER = BASE_DIR / "data" / "exports"
     ALLOWED_EXTENSIONS = {"pdf"}
 
+    # Rate limiter storage (Flask-Limiter). "memory://" keeps separate counters
+    # per process, so with several Gunicorn workers the effective limit is
+    # multiplied by the worker count. Use a shared backend there, e.g.
+    # "redis://localhost:6379/0" or "memcached://localhost:11211".
+    RATELIMIT_STORAGE_URI = os.environ.get("RATELIMIT_STORAGE_URI", "memory://")
+
     # Input validation limits
     MAX_FILENAME_LENGTH = 255
     MAX_NAME_LENGTH = 100  # For first/last name
@@ -119,6 +125,16 @@ class Config:
 
     # Database settings
     DATABASE_PATH: Path | str = BASE_DIR / "data" / "annotations.db"
+    # Applied once at startup and replayed on every new connection
+    # (see DatabaseManager.exec_pragmas)
+    DATABASE_PRAGMAS = [
+        "PRAGMA journal_mode=WAL",
+        "PRAGMA synchronous=NORMAL",
+        "PRAGMA mmap_size=268435456",  # 256 MB
+        "PRAGMA cache_size=-65536",  # 64 MB
+        "PRAGMA busy_timeout=5000",
+        "PRAGMA temp_store=MEMORY",
+    ]
 
     # Desktop-Mode: export routes write directly to disk instead of streaming
     # an HTTP download. Needed for WebView-based desktop shells (e.g. Toga)
@@ -127,6 +143,11 @@ class Config:
     DESKTOP_MODE = os.environ.get("PDF_ANNOTATOR_DESKTOP_MODE") == "1"
     DESKTOP_EXPORT_DIR: Path = get_downloads_dir()
 
+    # Let nginx send downloads via X-Accel-Redirect instead of streaming them
+    # through the worker. Requires the internal locations from
+    # docs/deployment/produktion.md; off by default.
+    X_ACCEL_REDIRECT = os.environ.get("X_ACCEL_REDIRECT") == "1"
+
     # AI-assisted note editing (optional, disabled by default). When enabled,
     # note text and the user's instruction are sent to the configured
     # third-party provider.
@@ -145,6 +166,13 @@ class Config:
     PDF_ANNOTATION_FONT = "courier"
     PDF_ANNOTATION_COLOR = (0, 0.5, 0)  # Green in RGB 0-1 range
 
+    # Keep rendered page images as PNG files under UPLOAD_FOLDER/cache so
+    # repeat views skip the render (costs disk space per viewed page)
+    PAGE_IMAGE_CACHE = os.environ.get("PAGE_IMAGE_CACHE", "1") == "1"
+    # Size limit for that cache; least recently used images are deleted
+    # beyond it (checked in the background every few minutes). 0 = no limit
+    PAGE_IMAGE_CACHE_MAX_MB = int(os.environ.get("PAGE_IMAGE_CACHE_MAX_MB", "1024"))
+
     # Logging
     LOG_LEVEL = "INFO"
     LOG_FILE = BASE_DIR / "data" / "app.log"
@@ -6,12 +6,14 @@ Falls back to default browser if no Chromium-based browser is found.
 """
 
 import argparse
+import functools
 import logging
 import os
 import shutil
+import socket
 import sys
-import webbrowser
-from threading import Timer
+import time
+from threading import Thread
 from typing import Any
 
 
@@ -26,40 +28,38 @@ def get_window_size() -> tuple[int, int]:
     return 1400, 900
 
 
+@functools.lru_cache(maxsize=1)
 def find_chromium_browser() -> str | None:
     """
     Find a Chromium-based browser on the system.
 
+    The result is cached; candidates are probed in order and the search
+    stops at the first hit.
+
     Returns:
         Path to browser executable or None if not found
     """
     if sys.platform == "darwin":  # macOS
-        browsers = [
+        browsers = (
             "/Applications/Google Chrome.app/Contents/MacOS/Google Chrome",
             "/Applications/Chromium.app/Contents/MacOS/Chromium",
             "/Applications/Microsoft Edge.app/Contents/MacOS/Microsoft Edge",
             "/Applications/Brave Browser.app/Contents/MacOS/Brave Browser",
-        ]
-    elif sys.platform == "win32":  # Windows
-        browsers = [
-            shutil.which("chrome"),
-            shutil.which("msedge"),
-            shutil.which("chromium"),
-        ]
-    else:  # Linux
-        browsers = [
-            shutil.which("google-chrome"),
-            shutil.which("google-chrome-stable"),
-            shutil.which("chromium"),
-            shutil.which("chromium-browser"),
-            shutil.which("microsoft-edge"),
-        ]
+        )
+        return next((b for b in browsers if os.path.exists(b)), None)
 
-    for browser in browsers:
-        if browser and os.path.exists(browser):
-            return browser
-
-    return None
+    if sys.platform == "win32":  # Windows
+        names = ("chrome", "msedge", "chromium")
+    else:  # Linux
+        names = (
+            "google-chrome",
+            "google-chrome-stable",
+            "chromium",
+            "chromium-browser",
+            "microsoft-edge",
+        )
+    # shutil.which only returns existing executables, no extra exists() check
+    return next((b for b in map(shutil.which, names) if b), None)
 
 
 _devnull_fd = None
@@ -70,19 +70,22 @@ def suppress_output() -> None:
     """Suppress stdout and stderr for quiet mode.
 
     Redirects OS-level file descriptors so Chrome subprocess output
-    and Flask startup messages are also suppressed.
+    and Flask startup messages are also suppressed. Does nothing beyond
+    the log levels when there are no console streams (windowed builds) or
+    output is already suppressed.
     """
     global _devnull_fd, _original_stderr_fd
-    # Save original stderr fd for potential restore
-    _original_stderr_fd = os.dup(2)
-
-    # Redirect OS-level stdout (fd 1) and stderr (fd 2) to devnull
-    # This suppresses Chrome subprocess output and Flask startup messages
-    _devnull_fd = open(os.devnull, "w")  # noqa: SIM115
-    os.dup2(_devnull_fd.fileno(), 1)
-    os.dup2(_devnull_fd.fileno(), 2)
-    sys.stdout = _devnull_fd
-    sys.stderr = _devnull_fd
+    if _devnull_fd is None and sys.stdout is not None and sys.stderr is not None:
+        # Save original stderr fd for potential restore
+        _original_stderr_fd = os.dup(2)
+
+        # Redirect OS-level stdout (fd 1) and stderr (fd 2) to devnull
+        # This suppresses Chrome subprocess output and Flask startup messages
+        _devnull_fd = open(os.devnull, "w")  # noqa: SIM115
+        os.dup2(_devnull_fd.fileno(), 1)
+        os.dup2(_devnull_fd.fileno(), 2)
+        sys.stdout = _devnull_fd
+        sys.stderr = _devnull_fd
 
     # Suppress all logging (Flask, Werkzeug, flaskwebgui, app)
     logging.getLogger("werkzeug").setLevel(logging.ERROR)
@@ -90,6 +93,27 @@ def suppress_output() -> None:
     logging.getLogger("pdf_annotator").setLevel(logging.ERROR)
 
 
+def wait_for_server(port: int, timeout: float = 5.0) -> bool:
+    """
+    Wait until the local server accepts connections.
+
+    Args:
+        port: Port the server listens on (127.0.0.1)
+        timeout: Maximum time to wait in seconds
+
+    Returns:
+        True if the server is reachable, False on timeout
+    """
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.05):
+                return True
+        except OSError:
+            time.sleep(0.02)
+    return False
+
+
 def run_with_flaskwebgui(app: Any, width: int, height: int) -> None:
     """
     Run app with flaskwebgui (native window).
@@ -120,9 +144,14 @@ def run_with_browser(app: Any, port: int = 5123, verbose: bool = False) -> None:
         port: Port to run server on
         verbose: Whether to show verbose output
     """
+    import webbrowser
+
     url = f"http://127.0.0.1:{port}"
 
     def open_browser() -> None:
+        # Open as soon as the server is up; after the timeout open anyway
+        # and let the browser retry
+        wait_for_server(port)
         webbrowser.open(url)
 
     if verbose:
@@ -130,8 +159,7 @@ def run_with_browser(app: Any, port: int = 5123, verbose: bool = False) -> None:
         print(f"URL: {url}")
         print("Beenden mit Ctrl+C")
 
-    # Open browser after short delay to let server start
-    Timer(1.5, open_browser).start()
+    Thread(target=open_browser, daemon=True).start()
 
     # Run Flask server
     app.run(host="127.0.0.1", port=port, debug=False)
@@ -7,11 +7,109 @@ for documents and annotations.
 
 import sqlite3
 import threading
+from collections.abc import Iterator
 from contextlib import contextmanager
+from itertools import groupby
+from operator import itemgetter
 from pathlib import Path
 from typing import Any, Optional
 from uuid import uuid4
 
+# Complete schema, run as one script by init_db(). Column migrations for
+# older databases need conditional logic and stay in init_db().
+_SCHEMA_DDL = """
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS users (
+    id TEXT PRIMARY KEY,
+    username TEXT NOT NULL UNIQUE,
+    email TEXT NOT NULL UNIQUE,
+    password_hash TEXT NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    is_active INTEGER DEFAULT 1
+);
+
+CREATE TABLE IF NOT EXISTS documents (
+    id TEXT PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    original_filename TEXT NOT NULL,
+    file_path TEXT NOT NULL,
+    page_count INTEGER NOT NULL,
+    first_name TEXT DEFAULT '',
+    last_name TEXT DEFAULT '',
+    title TEXT DEFAULT '',
+    year TEXT DEFAULT '',
+    subject TEXT DEFAULT '',
+    upload_timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+);
+
+CREATE TABLE IF NOT EXISTS annotations (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    doc_id TEXT NOT NULL,
+    page_number INTEGER NOT NULL,
+    note_text TEXT DEFAULT '',
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (doc_id) REFERENCES documents(id) ON DELETE CASCADE,
+    UNIQUE(doc_id, page_number)
+);
+
+CREATE INDEX IF NOT EXISTS idx_annotations_doc_id ON annotations(doc_id);
+CREATE INDEX IF NOT EXISTS idx_annotations_page ON annotations(doc_id, page_number);
+CREATE INDEX IF NOT EXISTS idx_annotations_updated_at ON annotations(updated_at);
+-- Covering index for MAX(updated_at) per document in get_all_documents():
+-- the LEFT JOIN reads only the index
+CREATE INDEX IF NOT EXISTS idx_annotations_doc_updated
+    ON annotations(doc_id, updated_at);
+
+-- Every UPDATE on annotations sets updated_at itself; the old AFTER UPDATE
+-- trigger rewrote each updated row a second time
+DROP TRIGGER IF EXISTS update_annotation_timestamp;
+
+COMMIT;
+"""
+
+# Appended to UPDATE/DELETE on users so the last admin can never be
+# demoted, deactivated or deleted, even by two concurrent requests.
+# EXISTS stops at the first other admin instead of counting all of them.
+_SQL_NOT_LAST_ADMIN = (
+    " AND (is_admin = 0 OR EXISTS"
+    " (SELECT 1 FROM users AS other WHERE other.is_admin = 1 AND other.id != users.id))"
+)
+
+# Used when the first DatabaseManager() call passes no db_path
+_DEFAULT_DB_PATH = Path(__file__).parents[3] / "data" / "annotations.db"
+
+# Shared by upsert_annotation and upsert_annotations. Unchanged text is
+# not rewritten, so repeated auto-saves don't bump updated_at.
+_SQL_UPSERT_ANNOTATION = """
+    INSERT INTO annotations (doc_id, page_number, note_text)
+    VALUES (?, ?, ?)
+    ON CONFLICT(doc_id, page_number) DO UPDATE SET
+        note_text = excluded.note_text,
+        updated_at = CURRENT_TIMESTAMP
+    WHERE note_text IS NOT excluded.note_text
+"""
+_SQL_UPSERT_ANNOTATION_RETURNING = _SQL_UPSERT_ANNOTATION + "RETURNING updated_at"
+
+# Bound parameters per "IN (...)" query; SQLite's limit is 32766 since 3.32,
+# older builds allow only 999
+_MAX_IN_PARAMS = 500
+
+
+def _fetch_dicts(cursor: sqlite3.Cursor) -> list[dict[str, Any]]:
+    """
+    Fetch all rows of an executed query as dicts.
+
+    Zips the column names from cursor.description onto plain tuple rows,
+    which is cheaper than building each dict from a sqlite3.Row. Rows are
+    read by iterating the cursor, so no intermediate fetchall() list is
+    built. The cursor must have row_factory set to None.
+    """
+    columns = [col[0] for col in cursor.description]
+    return [dict(zip(columns, row, strict=False)) for row in cursor]
+
 
 class DatabaseManager:
     """
@@ -24,12 +122,16 @@ class DatabaseManager:
     _instance: Optional["DatabaseManager"] = None
     _db_path: str | Path | None = None
     _lock = threading.Lock()
+    _pragmas: tuple[str, ...] = ()
+    _local: threading.local
 
     def __new__(cls, db_path: str | Path | None = None) -> "DatabaseManager":
         """
         Create or return singleton instance.
 
         Thread-safe via _lock to prevent race conditions during initialization.
+        Once the instance exists it is returned without taking the lock, so
+        the per-request DatabaseManager() calls in the routes stay cheap.
 
         Args:
             db_path: Path to SQLite database file (str for ':memory:', Path otherwise)
@@ -37,21 +139,49 @@ class DatabaseManager:
         Returns:
             DatabaseManager instance
         """
+        instance = cls._instance
+        if instance is not None:
+            return instance
         with cls._lock:
             if cls._instance is None:
-                cls._instance = super().__new__(cls)
+                # Fully set up before publishing: the fast path above may
+                # hand the instance out without the lock
+                instance = super().__new__(cls)
+                instance._local = threading.local()
                 if db_path:
                     cls._db_path = db_path
                 elif cls._db_path is None:
-                    # Default path
-                    cls._db_path = Path(__file__).parents[3] / "data" / "annotations.db"
+                    cls._db_path = _DEFAULT_DB_PATH
+                cls._instance = instance
         return cls._instance
 
+    def _connect(self) -> sqlite3.Connection:
+        """
+        Return this thread's connection, opening it on first use.
+
+        SQLite connections must not be shared between threads, so each
+        thread keeps its own in a threading.local.
+        """
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(str(self._db_path))
+            conn.row_factory = sqlite3.Row  # Enable column access by name
+            conn.execute("PRAGMA foreign_keys = ON")
+            for pragma in self._pragmas:
+                conn.execute(pragma)
+            self._local.conn = conn
+            self._local.depth = 0
+        return conn
+
     @contextmanager
     def get_connection(self) -> Any:
         """
         Context manager for database connections.
 
+        The connection is cached per thread and stays open between calls.
+        The outermost block commits on success and rolls back on any
+        exception; nested blocks join the surrounding transaction.
+
         Yields:
             sqlite3.Connection: Database connection
 
@@ -60,143 +190,95 @@ class DatabaseManager:
                 cursor = conn.cursor()
                 cursor.execute("SELECT * FROM documents")
         """
-        conn = sqlite3.connect(str(self._db_path))
-        conn.row_factory = sqlite3.Row  # Enable column access by name
-        conn.execute("PRAGMA foreign_keys = ON")
-        conn.execute("PRAGMA journal_mode=WAL")
+        conn = self._connect()
+        self._local.depth += 1
         try:
             yield conn
-            conn.commit()
-        except sqlite3.Error:
-            conn.rollback()
+            if self._local.depth == 1:
+                conn.commit()
+        except BaseException:
+            if self._local.depth == 1:
+                conn.rollback()
             raise
         finally:
+            self._local.depth -= 1
+
+    def close(self) -> None:
+        """Close the calling thread's cached connection, if any."""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
             conn.close()
+            del self._local.conn
+
+    def exec_pragmas(self, pragmas: list[str]) -> None:
+        """
+        Apply SQLite PRAGMAs once now and on every connection opened afterwards.
+
+        Persistent settings (journal_mode) are written to the database file by
+        the immediate run. Connection-scoped settings (synchronous, cache_size,
+        mmap_size, busy_timeout, temp_store) only last for one connection, so
+        get_connection() replays them.
+
+        Args:
+            pragmas: Complete PRAGMA statements, e.g. "PRAGMA synchronous=NORMAL"
+
+        Example:
+            db.exec_pragmas(["PRAGMA journal_mode=WAL", "PRAGMA synchronous=NORMAL"])
+        """
+        with self.get_connection() as conn:
+            for pragma in pragmas:
+                conn.execute(pragma)
+        self._pragmas = tuple(pragmas)
 
     def init_db(self) -> None:
         """
         Initialize database schema.
 
-        Creates tables, indices, and triggers if they don't exist.
+        Creates tables and indices if they don't exist.
         Safe to call multiple times (idempotent).
         """
         with self.get_connection() as conn:
-            cursor = conn.cursor()
-
-            # Create users table
-            cursor.execute(
-                """
-                CREATE TABLE IF NOT EXISTS users (
-                    id TEXT PRIMARY KEY,
-                    username TEXT NOT NULL UNIQUE,
-                    email TEXT NOT NULL UNIQUE,
-                    password_hash TEXT NOT NULL,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    is_active INTEGER DEFAULT 1
-                )
-            """
-            )
-
-            # Create documents table
-            cursor.execute(
-                """
-                CREATE TABLE IF NOT EXISTS documents (
-                    id TEXT PRIMARY KEY,
-                    user_id TEXT NOT NULL,
-                    original_filename TEXT NOT NULL,
-                    file_path TEXT NOT NULL,
-                    page_count INTEGER NOT NULL,
-                    first_name TEXT DEFAULT '',
-                    last_name TEXT DEFAULT '',
-                    title TEXT DEFAULT '',
-                    year TEXT DEFAULT '',
-                    subject TEXT DEFAULT '',
-                    upload_timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
-                )
-            """
-            )
+            conn.executescript(_SCHEMA_DDL)
 
             # Migrate existing database (add new columns if they don't exist)
-            migration_columns = [
-                "first_name TEXT DEFAULT ''",
-                "last_name TEXT DEFAULT ''",
-                "title TEXT DEFAULT ''",
-                "year TEXT DEFAULT ''",
-                "subject TEXT DEFAULT ''",
-                "user_id TEXT",
-            ]
-            for col_def in migration_columns:
-                try:
-                    cursor.execute(f"ALTER TABLE documents ADD COLUMN {col_def}")
-                except sqlite3.OperationalError:
-                    pass  # Column already exists
-
-            # Add is_admin column to users table if it doesn't exist
-            try:
-                cursor.execute(
-                    "ALTER TABLE users ADD COLUMN is_admin INTEGER DEFAULT 0"
-                )
-            except sqlite3.OperationalError:
-                pass  # Column already exists
-
-            # Add theme column to users table if it doesn't exist
-            try:
-                cursor.execute("ALTER TABLE users ADD COLUMN theme TEXT DEFAULT NULL")
-            except sqlite3.OperationalError:
-                pass  # Column already exists
-
-            # Create annotations table
-            cursor.execute(
-                """
-                CREATE TABLE IF NOT EXISTS annotations (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    doc_id TEXT NOT NULL,
-                    page_number INTEGER NOT NULL,
-                    note_text TEXT DEFAULT '',
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    FOREIGN KEY (doc_id) REFERENCES documents(id) ON DELETE CASCADE,
-                    UNIQUE(doc_id, page_number)
-                )
-            """
+            cursor = conn.cursor()
+            self._add_missing_columns(
+                cursor,
+                "documents",
+                [
+                    "first_name TEXT DEFAULT ''",
+                    "last_name TEXT DEFAULT ''",
+                    "title TEXT DEFAULT ''",
+                    "year TEXT DEFAULT ''",
+                    "subject TEXT DEFAULT ''",
+                    "user_id TEXT",
+                ],
             )
-
-            # Create indices for performance
-            cursor.execute(
-                """
-                CREATE INDEX IF NOT EXISTS idx_annotations_doc_id
-                ON annotations(doc_id)
-            """
+            self._add_missing_columns(
+                cursor,
+                "users",
+                ["is_admin INTEGER DEFAULT 0", "theme TEXT DEFAULT NULL"],
             )
 
-            cursor.execute(
-                """
-                CREATE INDEX IF NOT EXISTS idx_annotations_page
-                ON annotations(doc_id, page_number)
-            """
-            )
+    @staticmethod
+    def _add_missing_columns(
+        cursor: sqlite3.Cursor, table: str, column_defs: list[str]
+    ) -> None:
+        """
+        Add columns to an existing table unless they are already present.
 
-            cursor.execute(
-                """
-                CREATE INDEX IF NOT EXISTS idx_annotations_updated_at
-                ON annotations(updated_at)
-            """
-            )
+        Reads the current columns once via PRAGMA table_info, so an
+        up-to-date database needs no ALTER TABLE at all.
 
-            # Create trigger for automatic updated_at
-            cursor.execute(
-                """
-                CREATE TRIGGER IF NOT EXISTS update_annotation_timestamp
-                AFTER UPDATE ON annotations
-                FOR EACH ROW
-                BEGIN
-                    UPDATE annotations
-                    SET updated_at = CURRENT_TIMESTAMP
-                    WHERE id = NEW.id;
-                END
-            """
-            )
+        Args:
+            cursor: Cursor of the open init_db() connection
+            table: Table name (trusted, not user input)
+            column_defs: Column definitions, e.g. "title TEXT DEFAULT ''"
+        """
+        existing = {row[1] for row in cursor.execute(f"PRAGMA table_info({table})")}
+        for col_def in column_defs:
+            if col_def.split(maxsplit=1)[0] not in existing:
+                cursor.execute(f"ALTER TABLE {table} ADD COLUMN {col_def}")
 
     def create_document(
         self,
@@ -290,6 +372,45 @@ class DatabaseManager:
                 return dict(row)
         return None
 
+    def get_annotation_with_doc_check(
+        self, doc_id: str, page_number: int
+    ) -> dict[str, Any] | None:
+        """
+        Retrieve what a viewer page request needs in one query.
+
+        Joins the page's annotation (if any) to the document row, so the
+        ownership and page bounds checks need no separate get_document().
+
+        Args:
+            doc_id: UUID of document
+            page_number: Page number (1-indexed)
+
+        Returns:
+            dict with user_id, file_path, page_count, note_text and
+            updated_at (both None without annotation), or None if the
+            document does not exist
+
+        Example:
+            page = db.get_annotation_with_doc_check("abc-123", 1)
+            if page:
+                print(page["page_count"], page["note_text"])
+        """
+        with self.get_connection() as conn:
+            row = conn.execute(
+                """
+                SELECT d.user_id, d.file_path, d.page_count,
+                       a.note_text, a.updated_at
+                FROM documents AS d
+                LEFT JOIN annotations AS a
+                    ON a.doc_id = d.id AND a.page_number = ?
+                WHERE d.id = ?
+            """,
+                (page_number, doc_id),
+            ).fetchone()
+            if row:
+                return dict(row)
+        return None
+
     def update_document_metadata(
         self,
         doc_id: str,
@@ -333,31 +454,55 @@ class DatabaseManager:
         except sqlite3.Error:
             return False
 
-    def upsert_annotation(self, doc_id: str, page_number: int, note_text: str) -> None:
+    def upsert_annotation(self, doc_id: str, page_number: int, note_text: str) -> str:
         """
         Insert or update annotation for a specific page.
 
         Uses a single atomic INSERT ... ON CONFLICT DO UPDATE statement.
+        Saving unchanged text is a no-op, so repeated auto-saves neither
+        write the row nor bump updated_at.
 
         Args:
             doc_id: UUID of document
             page_number: Page number (1-indexed)
             note_text: Content of annotation
 
+        Returns:
+            updated_at of the stored annotation
+
         Example:
-            db.upsert_annotation("abc-123", 1, "This is a note for page 1")
+            updated_at = db.upsert_annotation("abc-123", 1, "Note for page 1")
         """
         with self.get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute(
-                """
-                INSERT INTO annotations (doc_id, page_number, note_text)
-                VALUES (?, ?, ?)
-                ON CONFLICT(doc_id, page_number) DO UPDATE SET
-                    note_text = excluded.note_text,
-                    updated_at = CURRENT_TIMESTAMP
-                """,
-                (doc_id, page_number, note_text),
+            row = conn.execute(
+                _SQL_UPSERT_ANNOTATION_RETURNING, (doc_id, page_number, note_text)
+            ).fetchone()
+            if row is None:
+                # Unchanged text: the conflict update was skipped, no row returned
+                row = conn.execute(
+                    "SELECT updated_at FROM annotations "
+                    "WHERE doc_id = ? AND page_number = ?",
+                    (doc_id, page_number),
+                ).fetchone()
+            return str(row["updated_at"])
+
+    def upsert_annotations(
+        self, doc_id: str, annotations: list[tuple[int, str]]
+    ) -> None:
+        """
+        Insert or update several annotations of one document in one transaction.
+
+        Args:
+            doc_id: UUID of document
+            annotations: (page_number, note_text) pairs
+
+        Example:
+            db.upsert_annotations("abc-123", [(1, "Intro"), (2, "Methods")])
+        """
+        with self.get_connection() as conn:
+            conn.executemany(
+                _SQL_UPSERT_ANNOTATION,
+                [(doc_id, page, text) for page, text in annotations],
             )
 
     def get_annotation(self, doc_id: str, page_number: int) -> dict[str, Any] | None:
@@ -408,6 +553,7 @@ class DatabaseManager:
         """
         with self.get_connection() as conn:
             cursor = conn.cursor()
+            cursor.row_factory = None  # plain tuples, see _fetch_dicts
             cursor.execute(
                 """
                 SELECT id, doc_id, page_number, note_text, created_at, updated_at
@@ -417,8 +563,101 @@ class DatabaseManager:
             """,
                 (doc_id,),
             )
-            rows = cursor.fetchall()
-            return [dict(row) for row in rows]
+            return _fetch_dicts(cursor)
+
+    def get_annotations_by_document(
+        self, doc_ids: list[str]
+    ) -> dict[str, list[dict[str, Any]]]:
+        """
+        Retrieve the annotations of several documents, grouped by document.
+
+        Replaces one get_all_annotations() call per document with one query
+        per 500 documents.
+
+        Args:
+            doc_ids: UUIDs of documents
+
+        Returns:
+            dict mapping doc_id to its annotation dicts sorted by page_number;
+            documents without annotations are missing
+
+        Example:
+            by_doc = db.get_annotations_by_document(["abc-123", "def-456"])
+            annotations = by_doc.get("abc-123", [])
+        """
+        grouped: dict[str, list[dict[str, Any]]] = {}
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.row_factory = None  # plain tuples, see _fetch_dicts
+            for start in range(0, len(doc_ids), _MAX_IN_PARAMS):
+                batch = doc_ids[start : start + _MAX_IN_PARAMS]
+                placeholders = ",".join("?" * len(batch))
+                cursor.execute(
+                    f"""
+                    SELECT id, doc_id, page_number, note_text, created_at, updated_at
+                    FROM annotations
+                    WHERE doc_id IN ({placeholders})
+                    ORDER BY doc_id, page_number ASC
+                """,
+                    batch,
+                )
+                for doc_id, rows in groupby(
+                    _fetch_dicts(cursor), key=itemgetter("doc_id")
+                ):
+                    grouped[doc_id] = list(rows)
+        return grouped
+
+    def iter_annotations(self, doc_id: str) -> Iterator[sqlite3.Row]:
+        """
+        Yield the annotations of a document one row at a time, by page number.
+
+        Unlike get_all_annotations() no list is built, so only the current
+        row is held in memory. The query runs outside get_connection(): a
+        generator that is abandoned early would otherwise leave the
+        transaction depth raised for this thread.
+
+        Args:
+            doc_id: UUID of document
+
+        Yields:
+            sqlite3.Row with page_number, note_text and updated_at
+
+        Example:
+            for ann in db.iter_annotations("abc-123"):
+                print(f"Page {ann['page_number']}: {ann['note_text']}")
+        """
+        yield from self._connect().execute(
+            """
+            SELECT page_number, note_text, updated_at
+            FROM annotations
+            WHERE doc_id = ?
+            ORDER BY page_number ASC
+        """,
+            (doc_id,),
+        )
+
+    def get_last_edited(self, doc_id: str) -> str | None:
+        """
+        Return the most recent annotation timestamp of a document.
+
+        Answered from the idx_annotations_doc_updated index without
+        loading any annotation rows.
+
+        Args:
+            doc_id: UUID of document
+
+        Returns:
+            Latest updated_at as string, or None if there are no annotations
+
+        Example:
+            last_edited = db.get_last_edited("abc-123")
+        """
+        with self.get_connection() as conn:
+            row = conn.execute(
+                "SELECT MAX(updated_at) FROM annotations WHERE doc_id = ?",
+                (doc_id,),
+            ).fetchone()
+            return row[0]
 
     def delete_document(self, doc_id: str) -> bool:
         """
@@ -494,7 +733,7 @@ class DatabaseManager:
             cursor.execute(
                 """
                 UPDATE annotations
-                SET page_number = page_number - 1
+                SET page_number = page_number - 1, updated_at = CURRENT_TIMESTAMP
                 WHERE doc_id = ? AND page_number > ?
             """,
                 (doc_id, deleted_page),
@@ -523,7 +762,8 @@ class DatabaseManager:
                 (doc_id, deleted_page),
             )
             conn.execute(
-                "UPDATE annotations SET page_number = page_number - 1 "
+                "UPDATE annotations SET page_number = page_number - 1, "
+                "updated_at = CURRENT_TIMESTAMP "
                 "WHERE doc_id = ? AND page_number > ?",
                 (doc_id, deleted_page),
             )
@@ -565,6 +805,54 @@ class DatabaseManager:
             )
         return user_id
 
+    def register_user(
+        self, username: str, email: str, password_hash: str
+    ) -> tuple[str, bool] | None:
+        """
+        Create a user and make them admin if they are the first one.
+
+        Both steps run in one transaction: the INSERT takes SQLite's write
+        lock, so two concurrent first registrations cannot both (or neither)
+        become admin.
+
+        Args:
+            username: Username (must be unique)
+            email: Email address (must be unique)
+            password_hash: Hashed password from werkzeug.security
+
+        Returns:
+            (user_id, is_admin), or None if the username is already taken
+
+        Raises:
+            sqlite3.IntegrityError: If the email already exists
+
+        Example:
+            result = db.register_user("jdoe", "john@example.com", pw_hash)
+            if result is None:
+                print("Username taken")
+        """
+        user_id = str(uuid4())
+        with self.get_connection() as conn:
+            row = conn.execute(
+                """
+                INSERT INTO users (id, username, email, password_hash)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT(username) DO NOTHING
+                RETURNING id
+            """,
+                (user_id, username, email, password_hash),
+            ).fetchone()
+            if row is None:
+                return None
+            cursor = conn.execute(
+                """
+                UPDATE users SET is_admin = 1
+                WHERE id = ? AND NOT EXISTS (SELECT 1 FROM users WHERE id != ?)
+            """,
+                (user_id, user_id),
+            )
+            return user_id, cursor.rowcount > 0
+
     def get_user_by_id(self, user_id: str) -> dict[str, Any] | None:
         """
         Retrieve user by ID.
@@ -595,6 +883,35 @@ class DatabaseManager:
                 return dict(row)
         return None
 
+    def get_user_with_admin_count(self, user_id: str) -> dict[str, Any] | None:
+        """
+        Retrieve user by ID together with the total number of admins.
+
+        Saves the separate count_admins() query in the admin routes.
+
+        Args:
+            user_id: UUID of user
+
+        Returns:
+            dict with user data plus "admin_count", or None if not found
+
+        Example:
+            user = db.get_user_with_admin_count("user-id-123")
+            if user and user["is_admin"] and user["admin_count"] <= 1:
+                print("Last admin")
+        """
+        with self.get_connection() as conn:
+            row = conn.execute(
+                """
+                SELECT id, username, email, is_active, is_admin,
+                       (SELECT COUNT(*) FROM users WHERE is_admin = 1) AS admin_count
+                FROM users
+                WHERE id = ?
+            """,
+                (user_id,),
+            ).fetchone()
+            return dict(row) if row else None
+
     def get_user_by_username(self, username: str) -> dict[str, Any] | None:
         """
         Retrieve user by username.
@@ -642,6 +959,7 @@ class DatabaseManager:
         """
         with self.get_connection() as conn:
             cursor = conn.cursor()
+            cursor.row_factory = None  # plain tuples, see _fetch_dicts
             cursor.execute(
                 """
                 SELECT d.id, d.user_id, d.original_filename, d.file_path, d.page_count,
@@ -656,8 +974,42 @@ class DatabaseManager:
             """,
                 (user_id,),
             )
-            rows = cursor.fetchall()
-            return [dict(row) for row in rows]
+            return _fetch_dicts(cursor)
+
+    def get_export_summary(self, user_id: str) -> dict[str, Any]:
+        """
+        Count a user's documents and annotations for the export preview.
+
+        One grouped query instead of a get_document() and
+        get_all_annotations() call per document.
+
+        Args:
+            user_id: UUID of user
+
+        Returns:
+            dict with document_count, annotation_count and file_paths
+            (PDF path of every document)
+
+        Example:
+            summary = db.get_export_summary("user-id-123")
+            print(summary["document_count"], summary["annotation_count"])
+        """
+        with self.get_connection() as conn:
+            rows = conn.execute(
+                """
+                SELECT d.file_path, COUNT(a.doc_id) AS annotation_count
+                FROM documents d
+                LEFT JOIN annotations a ON a.doc_id = d.id
+                WHERE d.user_id = ?
+                GROUP BY d.id
+            """,
+                (user_id,),
+            ).fetchall()
+        return {
+            "document_count": len(rows),
+            "annotation_count": sum(row["annotation_count"] for row in rows),
+            "file_paths": [row["file_path"] for row in rows],
+        }
 
     def get_all_users(self) -> list[dict[str, Any]]:
         """
@@ -673,6 +1025,7 @@ class DatabaseManager:
         """
         with self.get_connection() as conn:
             cursor = conn.cursor()
+            cursor.row_factory = None  # plain tuples, see _fetch_dicts
             cursor.execute(
                 """
                 SELECT id, username, email, is_active, is_admin, created_at
@@ -680,8 +1033,7 @@ class DatabaseManager:
                 ORDER BY created_at ASC
             """
             )
-            rows = cursor.fetchall()
-            return [dict(row) for row in rows]
+            return _fetch_dicts(cursor)
 
     def set_user_active(self, user_id: str, is_active: bool) -> bool:
         """
@@ -692,7 +1044,8 @@ class DatabaseManager:
             is_active: True to activate, False to deactivate
 
         Returns:
-            bool: True if successful, False otherwise
+            bool: True if successful, False otherwise (also when the user is
+            the last admin and would be deactivated)
 
         Example:
             success = db.set_user_active("user-id-123", False)
@@ -700,14 +1053,10 @@ class DatabaseManager:
         try:
             with self.get_connection() as conn:
                 cursor = conn.cursor()
-                cursor.execute(
-                    """
-                    UPDATE users
-                    SET is_active = ?
-                    WHERE id = ?
-                """,
-                    (1 if is_active else 0, user_id),
-                )
+                sql = "UPDATE users SET is_active = ? WHERE id = ?"
+                if not is_active:
+                    sql += _SQL_NOT_LAST_ADMIN
+                cursor.execute(sql, (1 if is_active else 0, user_id))
                 return bool(cursor.rowcount > 0)
         except sqlite3.Error:
             return False
@@ -721,7 +1070,7 @@ class DatabaseManager:
             is_admin: True to make admin, False to remove admin privileges
 
         Returns:
-            bool: True if successful, False otherwise
+            bool: True if successful, False otherwise (also for the last admin)
 
         Example:
             success = db.set_user_admin("user-id-123", True)
@@ -729,14 +1078,10 @@ class DatabaseManager:
         try:
             with self.get_connection() as conn:
                 cursor = conn.cursor()
-                cursor.execute(
-                    """
-                    UPDATE users
-                    SET is_admin = ?
-                    WHERE id = ?
-                """,
-                    (1 if is_admin else 0, user_id),
-                )
+                sql = "UPDATE users SET is_admin = ? WHERE id = ?"
+                if not is_admin:
+                    sql += _SQL_NOT_LAST_ADMIN
+                cursor.execute(sql, (1 if is_admin else 0, user_id))
                 return bool(cursor.rowcount > 0)
         except sqlite3.Error:
             return False
@@ -749,7 +1094,7 @@ class DatabaseManager:
             user_id: UUID of user
 
         Returns:
-            bool: True if user was deleted, False if not found
+            bool: True if user was deleted, False if not found or last admin
 
         Example:
             if db.delete_user("user-id-123"):
@@ -758,7 +1103,9 @@ class DatabaseManager:
         try:
             with self.get_connection() as conn:
                 cursor = conn.cursor()
-                cursor.execute("DELETE FROM users WHERE id = ?", (user_id,))
+                cursor.execute(
+                    "DELETE FROM users WHERE id = ?" + _SQL_NOT_LAST_ADMIN, (user_id,)
+                )
                 return bool(cursor.rowcount > 0)
         except sqlite3.Error:
             return False
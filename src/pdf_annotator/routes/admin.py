@@ -4,8 +4,6 @@ Admin routes for user management.
 Provides endpoints for listing users and managing their status/privileges.
 """
 
-from functools import wraps
-
 from flask import Blueprint, abort, jsonify, render_template
 from flask_login import current_user, login_required
 
@@ -14,21 +12,15 @@ from pdf_annotator.models.database import DatabaseManager
 admin_bp = Blueprint("admin", __name__)
 
 
-def admin_required(f):
-    """Decorator to require admin privileges."""
-
-    @wraps(f)
-    @login_required
-    def decorated(*args, **kwargs):
-        if not current_user.is_admin:
-            abort(403)
-        return f(*args, **kwargs)
-
-    return decorated
+@admin_bp.before_request
+@login_required
+def require_admin() -> None:
+    """Require an authenticated admin for every route of this blueprint."""
+    if not current_user.is_admin:
+        abort(403)
 
 
 @admin_bp.route("/", methods=["GET"])
-@admin_required
 def index() -> str:
     """Display admin panel with user list."""
     db = DatabaseManager()
@@ -37,11 +29,10 @@ def index() -> str:
 
 
 @admin_bp.route("/user/<user_id>/toggle_active", methods=["POST"])
-@admin_required
 def toggle_active(user_id: str):
     """Toggle user active status (activate/deactivate)."""
     db = DatabaseManager()
-    user_data = db.get_user_by_id(user_id)
+    user_data = db.get_user_with_admin_count(user_id)
 
     if not user_data:
         return jsonify({"error": "Benutzer nicht gefunden"}), 404
@@ -55,7 +46,7 @@ def toggle_active(user_id: str):
 
     # Don't allow deactivating the last admin
     if user_data["is_admin"]:
-        if db.count_admins() <= 1:
+        if user_data["admin_count"] <= 1:
             return (
                 jsonify({"error": "Der letzte Admin kann nicht deaktiviert werden"}),
                 403,
@@ -78,11 +69,10 @@ def toggle_active(user_id: str):
 
 
 @admin_bp.route("/user/<user_id>/toggle_admin", methods=["POST"])
-@admin_required
 def toggle_admin(user_id: str):
     """Toggle user admin status."""
     db = DatabaseManager()
-    user_data = db.get_user_by_id(user_id)
+    user_data = db.get_user_with_admin_count(user_id)
 
     if not user_data:
         return jsonify({"error": "Benutzer nicht gefunden"}), 404
@@ -96,7 +86,7 @@ def toggle_admin(user_id: str):
 
     # Don't allow removing the last admin
     if user_data["is_admin"]:
-        if db.count_admins() <= 1:
+        if user_data["admin_count"] <= 1:
             return (
                 jsonify({"error": "Der letzte Admin kann nicht entrollt werden"}),
                 403,
@@ -119,11 +109,10 @@ def toggle_admin(user_id: str):
 
 
 @admin_bp.route("/user/<user_id>", methods=["DELETE"])
-@admin_required
 def delete_user(user_id: str):
     """Delete a user and all their documents."""
     db = DatabaseManager()
-    user_data = db.get_user_by_id(user_id)
+    user_data = db.get_user_with_admin_count(user_id)
 
     if not user_data:
         return jsonify({"error": "Benutzer nicht gefunden"}), 404
@@ -134,7 +123,7 @@ def delete_user(user_id: str):
 
     # Don't allow deleting the last admin
     if user_data["is_admin"]:
-        if db.count_admins() <= 1:
+        if user_data["admin_count"] <= 1:
             return jsonify(
                 {"error": "Der letzte Admin kann nicht gelöscht werden"}
             ), 403
@@ -13,6 +13,7 @@ from werkzeug.security import check_password_hash, generate_password_hash
 
 from pdf_annotator.models.database import DatabaseManager
 from pdf_annotator.models.user import User
+from pdf_annotator.utils.validators import validate_email
 
 auth_bp = Blueprint("auth", __name__, url_prefix="/auth")
 
@@ -140,18 +141,14 @@ def register_post() -> ResponseReturnValue:
         )
 
     # Check if email format is valid (basic check)
-    if "@" not in email or "." not in email.split("@")[1]:
-        return (
-            render_template(
-                "auth/register.html",
-                error="Ungültige E-Mail-Adresse.",
-            ),
-            400,
-        )
+    is_valid, error = validate_email(email)
+    if not is_valid:
+        return render_template("auth/register.html", error=error), 400
 
     db = DatabaseManager()
 
-    # Check if username already exists
+    # Cheap check before the expensive password hash; register_user's
+    # ON CONFLICT remains the race-safe final check
     if db.get_user_by_username(username):
         return (
             render_template(
@@ -161,10 +158,10 @@ def register_post() -> ResponseReturnValue:
             409,
         )
 
-    # Create user
+    # Create user; the first user becomes admin in the same transaction
     password_hash = generate_password_hash(password)
     try:
-        user_id = db.create_user(username, email, password_hash)
+        registered = db.register_user(username, email, password_hash)
     except sqlite3.IntegrityError:
         return (
             render_template(
@@ -174,13 +171,18 @@ def register_post() -> ResponseReturnValue:
             409,
         )
 
-    # Make first user an admin
-    is_first_user = db.count_users() == 1
-    if is_first_user:
-        db.set_user_admin(user_id, True)
+    if registered is None:
+        return (
+            render_template(
+                "auth/register.html",
+                error="Benutzername bereits vergeben.",
+            ),
+            409,
+        )
+    user_id, is_admin = registered
 
     # Log in automatically
-    user = User(user_id, username, email, True, is_first_user)
+    user = User(user_id, username, email, True, is_admin)
     login_user(user)
 
     return redirect(url_for("upload.list_documents"))
@@ -4,6 +4,8 @@ Export route for PDF Annotator.
 Handles PDF and Markdown export with downloads.
 """
 
+import os
+import threading
 import time
 from pathlib import Path
 from typing import Any
@@ -33,21 +35,55 @@ export_bp = Blueprint("export", __name__, url_prefix="/export")
 # Max age for export files before cleanup (1 hour)
 EXPORT_MAX_AGE_SECONDS = 3600
 
+# Minimum time between two cleanup runs of this process (5 minutes)
+EXPORT_CLEANUP_INTERVAL_SECONDS = 300
+
+_last_cleanup = 0.0
+_cleanup_lock = threading.Lock()
+
 
 def cleanup_old_exports() -> None:
-    """Remove export files older than EXPORT_MAX_AGE_SECONDS."""
-    try:
-        export_folder = Path(current_app.config["EXPORT_FOLDER"])
-        if not export_folder.exists():
+    """
+    Start removal of old export files in the background.
+
+    Runs at most once per EXPORT_CLEANUP_INTERVAL_SECONDS and in a daemon
+    thread, so an export request never waits for the directory scan.
+    """
+    global _last_cleanup
+    now = time.time()
+    with _cleanup_lock:
+        if now - _last_cleanup < EXPORT_CLEANUP_INTERVAL_SECONDS:
             return
+        _last_cleanup = now
+
+    export_folder = os.fspath(current_app.config["EXPORT_FOLDER"])
+    threading.Thread(
+        target=remove_old_exports, args=(export_folder, now), daemon=True
+    ).start()
+
 
-        now = time.time()
-        for file_path in export_folder.iterdir():
-            if file_path.is_file():
-                age = now - file_path.stat().st_mtime
-                if age > EXPORT_MAX_AGE_SECONDS:
-                    file_path.unlink(missing_ok=True)
-                    logger.debug("Cleaned up old export: %s", file_path.name)
+def remove_old_exports(export_folder: str, now: float) -> None:
+    """
+    Remove export files older than EXPORT_MAX_AGE_SECONDS.
+
+    Args:
+        export_folder: Directory containing the export files
+        now: Reference time (epoch seconds) for the age check
+    """
+    try:
+        # scandir: one directory read, stat results come with the entries
+        with os.scandir(export_folder) as it:
+            for entry in it:
+                if not entry.is_file():
+                    continue
+                if now - entry.stat().st_mtime > EXPORT_MAX_AGE_SECONDS:
+                    try:
+                        os.unlink(entry.path)
+                    except FileNotFoundError:
+                        continue
+                    logger.debug("Cleaned up old export: %s", entry.name)
+    except FileNotFoundError:
+        return
     except Exception as e:
         logger.warning(f"Export cleanup failed: {e}")
 
@@ -165,24 +201,18 @@ def export_pdf(doc_id: str) -> Any:
         cleanup_old_exports()
 
         # Get last edited timestamp from annotations
-        annotations = db.get_all_annotations(doc_id)
-        last_edited = None
-        if annotations:
-            # Find the most recent updated_at timestamp
-            last_edited = max(ann["updated_at"] for ann in annotations)
+        last_edited = db.get_last_edited(doc_id)
 
         # Generate output filename with metadata
         export_filename = generate_annotated_filename(doc_info, last_edited)
 
-        # Create unique temporary file path
+        # Create unique temporary file path (EXPORT_FOLDER is created at
+        # startup by the config's init_app)
         export_id = str(uuid4())
         export_path = (
             Path(current_app.config["EXPORT_FOLDER"]) / f"{export_id}_{export_filename}"
         )
 
-        # Ensure export directory exists
-        export_path.parent.mkdir(parents=True, exist_ok=True)
-
         # Generate annotated PDF
         success = create_annotated_pdf(
             doc_id,
@@ -254,24 +284,18 @@ def export_markdown(doc_id: str) -> Any:
         cleanup_old_exports()
 
         # Get last edited timestamp from annotations
-        annotations = db.get_all_annotations(doc_id)
-        last_edited = None
-        if annotations:
-            # Find the most recent updated_at timestamp
-            last_edited = max(ann["updated_at"] for ann in annotations)
+        last_edited = db.get_last_edited(doc_id)
 
         # Generate output filename with metadata
         export_filename = generate_markdown_filename(doc_info, last_edited)
 
-        # Create unique temporary file path
+        # Create unique temporary file path (EXPORT_FOLDER is created at
+        # startup by the config's init_app)
         export_id = str(uuid4())
         export_path = (
             Path(current_app.config["EXPORT_FOLDER"]) / f"{export_id}_{export_filename}"
         )
 
-        # Ensure export directory exists
-        export_path.parent.mkdir(parents=True, exist_ok=True)
-
         # Generate Markdown
         success = export_to_markdown(doc_id, export_path, db)
 
@@ -4,12 +4,15 @@ Upload route for PDF Annotator.
 Handles PDF file uploads, validation, and storage.
 """
 
+from collections.abc import Iterator
+from datetime import datetime
 from pathlib import Path
 from typing import Any
 from uuid import uuid4
 
 from flask import (
     Blueprint,
+    Response,
     current_app,
     flash,
     jsonify,
@@ -22,9 +25,14 @@ from flask_login import current_user, login_required
 
 from pdf_annotator.models.database import DatabaseManager
 from pdf_annotator.services.data_manager import DataManager
-from pdf_annotator.services.pdf_processor import get_page_count, validate_pdf
+from pdf_annotator.services.pdf_processor import (
+    clear_page_image_cache,
+    get_page_count,
+    page_image_cache_dir,
+)
 from pdf_annotator.utils.downloads import send_file_response
 from pdf_annotator.utils.logger import get_logger
+from pdf_annotator.utils.uploads import save_upload
 from pdf_annotator.utils.validators import (
     sanitize_filename,
     validate_doc_id,
@@ -115,13 +123,17 @@ def upload_file() -> Any:
         storage_filename = f"{storage_id}{file_extension}"
         storage_path = Path(current_app.config["UPLOAD_FOLDER"]) / storage_filename
 
-        # Save file
-        storage_path.parent.mkdir(parents=True, exist_ok=True)
-        file.save(str(storage_path))
+        # Save file (hard link to the spooled upload, see utils/uploads.py);
+        # UPLOAD_FOLDER is created by init_app, the spool file already lives there
+        save_upload(file, storage_path)
         logger.info(f"File saved to: {storage_path}")
 
-        # Validate PDF
-        if not validate_pdf(storage_path):
+        # Validate PDF and get page count with a single open of the file
+        try:
+            page_count = get_page_count(storage_path)
+        except ValueError:
+            page_count = 0
+        if page_count < 1:
             # Clean up invalid file
             storage_path.unlink()
             logger.error(f"Invalid PDF file: {original_filename}")
@@ -133,23 +145,7 @@ def upload_file() -> Any:
                 ),
                 400,
             )
-
-        # Get page count
-        try:
-            page_count = get_page_count(storage_path)
-            logger.info(f"PDF has {page_count} pages")
-        except Exception as e:
-            # Clean up file
-            storage_path.unlink()
-            logger.error(f"Failed to get page count: {e}")
-            return (
-                jsonify(
-                    {
-                        "error": "Fehler beim Lesen der PDF-Datei. Ist die Datei beschädigt?"
-                    }
-                ),
-                400,
-            )
+        logger.info(f"PDF has {page_count} pages")
 
         # Get metadata from form
         first_name = request.form.get("first_name", "").strip()
@@ -184,8 +180,9 @@ def upload_file() -> Any:
         )
 
         # Initialize empty annotations for all pages
-        for page_num in range(1, page_count + 1):
-            db.upsert_annotation(doc_id, page_num, "")
+        db.upsert_annotations(
+            doc_id, [(page_num, "") for page_num in range(1, page_count + 1)]
+        )
 
         logger.info(f"Document created: {doc_id} with {page_count} pages")
 
@@ -270,6 +267,10 @@ def delete_document(doc_id: str) -> Any:
         else:
             logger.warning(f"File not found during deletion: {file_path}")
 
+        clear_page_image_cache(
+            page_image_cache_dir(current_app.config["UPLOAD_FOLDER"], doc_id)
+        )
+
         logger.info(f"Document deleted: {doc_id}")
         return jsonify({"success": True, "message": "Dokument erfolgreich gelöscht"})
 
@@ -296,22 +297,48 @@ def export_data() -> Any:
         upload_folder = Path(current_app.config["UPLOAD_FOLDER"])
         manager = DataManager(upload_folder)
 
-        # Get user's documents
+        # Get user's documents; the rows are passed on, not fetched again
         user_docs = db.get_all_documents(current_user.id)
-        doc_ids = [doc["id"] for doc in user_docs]
-
-        # Create export
-        zip_path = manager.export_data(doc_ids)
 
-        logger.info(f"Data exported to: {zip_path}")
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        filename = f"pdf_annotator_backup_{timestamp}.zip"
 
-        return send_file_response(zip_path, zip_path.name, "application/zip")
+        if current_app.config["DESKTOP_MODE"]:
+            # Desktop shells need a file on disk
+            zip_path = manager.export_data(
+                output_path=Path(current_app.config["EXPORT_FOLDER"]) / filename,
+                documents=user_docs,
+            )
+            logger.info(f"Data exported to: {zip_path}")
+            return send_file_response(zip_path, filename, "application/zip")
+
+        # Stream the archive while it is written, without a file on disk
+        logger.info(f"Streaming data export of {len(user_docs)} documents")
+        return Response(
+            _log_stream_errors(manager.iter_export_data(documents=user_docs)),
+            mimetype="application/zip",
+            headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+        )
 
     except Exception as e:
         logger.error(f"Export failed: {e}", exc_info=True)
         return jsonify({"error": "Fehler beim Exportieren der Daten"}), 500
 
 
+def _log_stream_errors(chunks: Iterator[bytes]) -> Iterator[bytes]:
+    """
+    Pass a streamed export through, logging errors raised while streaming.
+
+    The generator runs after the view has returned, outside its try/except;
+    a failure only truncates the download, so it would otherwise go unlogged.
+    """
+    try:
+        yield from chunks
+    except Exception as e:
+        logger.error(f"Export failed while streaming: {e}", exc_info=True)
+        raise
+
+
 @upload_bp.route("/export/info", methods=["GET"])
 @login_required
 def export_info() -> Any:
@@ -326,15 +353,10 @@ def export_info() -> Any:
         Response: {"document_count": 5, "annotation_count": 42, "estimated_size_mb": 12.5}
     """
     try:
-        db = DatabaseManager()
         upload_folder = Path(current_app.config["UPLOAD_FOLDER"])
         manager = DataManager(upload_folder)
 
-        # Get user's documents
-        user_docs = db.get_all_documents(current_user.id)
-        doc_ids = [doc["id"] for doc in user_docs]
-
-        info = manager.get_export_info(doc_ids)
+        info = manager.get_export_info(user_id=current_user.id)
         return jsonify(info)
 
     except Exception as e:
@@ -371,53 +393,38 @@ def import_data() -> Any:
         if not file.filename.lower().endswith(".zip"):
             return jsonify({"error": "Nur ZIP-Dateien werden akzeptiert"}), 400
 
-        # Save to temp location
-        import tempfile
-
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".zip") as tmp:
-            try:
-                file.save(tmp.name)
-                tmp_path = Path(tmp.name)
-            except Exception as e:
-                logger.error(f"Failed to save uploaded file: {e}")
-                return jsonify({"error": "Fehler beim Hochladen der Datei"}), 400
-
-        try:
-            upload_folder = Path(current_app.config["UPLOAD_FOLDER"])
-            manager = DataManager(upload_folder)
-
-            # Import data and assign to current user
-            logger.info(f"Starting import for user {current_user.id} from {tmp_path}")
-            stats = manager.import_data(tmp_path, current_user.id)
-            logger.info(f"Import completed: {stats}")
-
-            # Check if anything was imported
-            if stats["documents_imported"] == 0 and stats["annotations_imported"] == 0:
-                logger.warning(f"Import resulted in no data: {stats}")
-                return jsonify(
-                    {
-                        "success": False,
-                        "error": "Keine gültigen Dokumente in der Backup-Datei gefunden",
-                    }
-                ), 400
+        upload_folder = Path(current_app.config["UPLOAD_FOLDER"])
+        manager = DataManager(upload_folder)
 
-            logger.info(
-                f"Data imported: {stats['documents_imported']} docs, "
-                f"{stats['annotations_imported']} annotations"
-            )
+        # Read the archive straight from the request's spool file (it is
+        # seekable), there is no need to copy it to another temp file first
+        logger.info(f"Starting import for user {current_user.id} from {file.filename}")
+        stats = manager.import_data(file.stream, current_user.id)
+        logger.info(f"Import completed: {stats}")
 
+        # Check if anything was imported
+        if stats["documents_imported"] == 0 and stats["annotations_imported"] == 0:
+            logger.warning(f"Import resulted in no data: {stats}")
             return jsonify(
                 {
-                    "success": True,
-                    "message": f"{stats['documents_imported']} Dokumente und "
-                    f"{stats['annotations_imported']} Notizen importiert",
-                    **stats,
+                    "success": False,
+                    "error": "Keine gültigen Dokumente in der Backup-Datei gefunden",
                 }
-            )
+            ), 400
 
-        finally:
-            # Clean up temp file
-            tmp_path.unlink(missing_ok=True)
+        logger.info(
+            f"Data imported: {stats['documents_imported']} docs, "
+            f"{stats['annotations_imported']} annotations"
+        )
+
+        return jsonify(
+            {
+                "success": True,
+                "message": f"{stats['documents_imported']} Dokumente und "
+                f"{stats['annotations_imported']} Notizen importiert",
+                **stats,
+            }
+        )
 
     except ValueError as e:
         logger.warning(f"Import validation failed: {e}", exc_info=True)
@@ -4,23 +4,41 @@ Viewer route for PDF Annotator.
 Handles viewer page and API endpoints for PDF rendering and annotations.
 """
 
+import hashlib
+import os
+import threading
+import time
 from pathlib import Path
 from typing import Any
+from uuid import uuid4
 
 import fitz
-from flask import Blueprint, Response, current_app, jsonify, render_template, request
+from flask import (
+    Blueprint,
+    Response,
+    current_app,
+    jsonify,
+    render_template,
+    request,
+)
 from flask.typing import ResponseReturnValue
 from flask_login import current_user, login_required
 
 from pdf_annotator.models.database import DatabaseManager
 from pdf_annotator.services.pdf_processor import (
+    clear_page_image_cache,
     clear_render_cache,
     clear_text_layout_cache,
+    get_cached_page_image,
     get_page_count,
     get_page_text_layout,
+    page_image_cache_dir,
+    prune_page_image_cache,
     render_page_to_image,
 )
+from pdf_annotator.utils.downloads import send_inline_file
 from pdf_annotator.utils.logger import get_logger
+from pdf_annotator.utils.uploads import save_upload
 from pdf_annotator.utils.validators import (
     validate_doc_id,
     validate_file_size,
@@ -35,19 +53,28 @@ logger = get_logger(__name__)
 viewer_bp = Blueprint("viewer", __name__, url_prefix="/viewer")
 
 
-def _get_doc_or_error(doc_id: str) -> tuple[dict, None] | tuple[None, tuple]:
+def _get_doc_or_error(
+    doc_id: str, page_number: int | None = None
+) -> tuple[dict, None] | tuple[None, tuple]:
     """
     Validate doc_id, fetch document, and verify ownership.
 
     Returns (doc_info, None) on success or (None, error_response_tuple) on failure.
     Used by all API endpoints to avoid repeating the same auth/ownership boilerplate.
+
+    With page_number, the page bounds are checked as well and doc_info comes
+    from get_annotation_with_doc_check(): file_path, page_count and the
+    page's note_text/updated_at from a single query.
     """
     is_valid, error_msg = validate_doc_id(doc_id)
     if not is_valid:
         return None, (jsonify({"error": error_msg}), 400)
 
     db = DatabaseManager()
-    doc_info = db.get_document(doc_id)
+    if page_number is None:
+        doc_info = db.get_document(doc_id)
+    else:
+        doc_info = db.get_annotation_with_doc_check(doc_id, page_number)
 
     if not doc_info:
         logger.warning("Document not found: %s", doc_id)
@@ -61,9 +88,69 @@ def _get_doc_or_error(doc_id: str) -> tuple[dict, None] | tuple[None, tuple]:
         )
         return None, (jsonify({"error": "Nicht berechtigt"}), 403)
 
+    if page_number is not None:
+        is_valid, error_msg = validate_page_number(page_number, doc_info["page_count"])
+        if not is_valid:
+            logger.warning(
+                "Invalid page number %d for document %s", page_number, doc_id
+            )
+            return None, (jsonify({"error": error_msg}), 400)
+
     return doc_info, None
 
 
+# Page images and text layers requested with the PDF's current version
+# (?v=, passed to the viewer by view_document) never change under that URL
+PAGE_CACHE_CONTROL = "private, max-age=300"
+VERSIONED_PAGE_CACHE_CONTROL = "private, max-age=86400, immutable"
+
+
+# Minimum time between two page image cache size checks of this process
+PAGE_IMAGE_CACHE_PRUNE_INTERVAL_SECONDS = 300
+
+_last_cache_prune = 0.0
+_cache_prune_lock = threading.Lock()
+
+
+def _prune_page_image_cache_later() -> None:
+    """
+    Enforce PAGE_IMAGE_CACHE_MAX_MB in the background.
+
+    Runs at most once per PAGE_IMAGE_CACHE_PRUNE_INTERVAL_SECONDS and in a
+    daemon thread, so a page request never waits for the directory scan.
+    """
+    global _last_cache_prune
+    max_mb = current_app.config["PAGE_IMAGE_CACHE_MAX_MB"]
+    if max_mb <= 0:
+        return
+    now = time.time()
+    with _cache_prune_lock:
+        if now - _last_cache_prune < PAGE_IMAGE_CACHE_PRUNE_INTERVAL_SECONDS:
+            return
+        _last_cache_prune = now
+
+    threading.Thread(
+        target=prune_page_image_cache,
+        args=(current_app.config["UPLOAD_FOLDER"], max_mb * 1024 * 1024),
+        daemon=True,
+    ).start()
+
+
+def _file_version(file_path: str) -> str:
+    """Return a token for the PDF file that changes whenever it is rewritten."""
+    try:
+        return str(os.stat(file_path).st_mtime_ns)
+    except OSError:
+        return ""
+
+
+def _page_cache_control(version: str) -> str:
+    """Return Cache-Control for a page resource, long-lived if ?v= is current."""
+    if version and request.args.get("v") == version:
+        return VERSIONED_PAGE_CACHE_CONTROL
+    return PAGE_CACHE_CONTROL
+
+
 @viewer_bp.route("/<doc_id>", methods=["GET"])
 @login_required
 def view_document(doc_id: str) -> Any:
@@ -118,6 +205,7 @@ def view_document(doc_id: str) -> Any:
             doc_id=doc_id,
             original_filename=doc_info["original_filename"],
             page_count=doc_info["page_count"],
+            page_version=_file_version(doc_info["file_path"]),
             first_name=doc_info.get("first_name", ""),
             last_name=doc_info.get("last_name", ""),
             title=doc_info.get("title", ""),
@@ -151,30 +239,58 @@ def get_page_image(doc_id: str, page_number: int) -> ResponseReturnValue:
         GET /viewer/api/page/abc-123/1
     """
     try:
-        doc_info, err = _get_doc_or_error(doc_id)
+        doc_info, err = _get_doc_or_error(doc_id, page_number)
         if err is not None:
             return err
         assert doc_info is not None
 
-        # Validate page number
-        is_valid, error_msg = validate_page_number(page_number, doc_info["page_count"])
-        if not is_valid:
-            logger.warning(
-                "Invalid page number %d for document %s", page_number, doc_id
+        dpi = current_app.config.get("PDF_RENDER_DPI", 300)
+        version = _file_version(doc_info["file_path"])
+        cache_control = _page_cache_control(version)
+
+        # Serve the PNG file from the page image cache (via nginx with
+        # X_ACCEL_REDIRECT); ETag lets the browser revalidate with a 304
+        # instead of downloading it again
+        if current_app.config["PAGE_IMAGE_CACHE"]:
+            cache_dir = page_image_cache_dir(
+                current_app.config["UPLOAD_FOLDER"], doc_id
+            )
+            image_path = get_cached_page_image(
+                doc_info["file_path"], page_number, dpi, cache_dir
+            )
+            _prune_page_image_cache_later()
+            if image_path is not None:
+                resp = send_inline_file(image_path, "image/png")
+                resp.headers["Cache-Control"] = cache_control
+                return resp
+
+        # Without the disk cache the ETag is derived from the PDF version,
+        # so a revalidation is answered before rendering
+        etag = hashlib.blake2b(
+            f"{doc_id}:{page_number}:{dpi}:{version}".encode(), digest_size=16
+        ).hexdigest()
+        if version and request.if_none_match.contains(etag):
+            resp = Response(status=304)
+        else:
+            image_bytes = render_page_to_image(
+                doc_info["file_path"],
+                page_number,
+                dpi=dpi,
+                mtime_ns=int(version) if version else None,
             )
-            return jsonify({"error": error_msg}), 400
 
-        # Render page
-        dpi = current_app.config.get("PDF_RENDER_DPI", 300)
-        image_bytes = render_page_to_image(doc_info["file_path"], page_number, dpi=dpi)
+            if image_bytes is None:
+                logger.error(
+                    f"Failed to render page {page_number} of document {doc_id}"
+                )
+                return jsonify({"error": "Fehler beim Rendern der Seite"}), 500
 
-        if image_bytes is None:
-            logger.error(f"Failed to render page {page_number} of document {doc_id}")
-            return jsonify({"error": "Fehler beim Rendern der Seite"}), 500
+            resp = Response(image_bytes, mimetype="image/png")
 
         # Return PNG image with cache headers
-        resp = Response(image_bytes, mimetype="image/png")
-        resp.headers["Cache-Control"] = "private, max-age=300"
+        if version:
+            resp.set_etag(etag)
+        resp.headers["Cache-Control"] = cache_control
         return resp
 
     except Exception as e:
@@ -205,20 +321,18 @@ def get_page_text(doc_id: str, page_number: int) -> Any:
         GET /viewer/api/page/abc-123/1/text
     """
     try:
-        doc_info, err = _get_doc_or_error(doc_id)
+        doc_info, err = _get_doc_or_error(doc_id, page_number)
         if err is not None:
             return err
         assert doc_info is not None
 
-        is_valid, error_msg = validate_page_number(page_number, doc_info["page_count"])
-        if not is_valid:
-            logger.warning(
-                "Invalid page number %d for document %s", page_number, doc_id
-            )
-            return jsonify({"error": error_msg}), 400
-
+        version = _file_version(doc_info["file_path"])
         try:
-            layout = get_page_text_layout(doc_info["file_path"], page_number)
+            layout = get_page_text_layout(
+                doc_info["file_path"],
+                page_number,
+                mtime_ns=int(version) if version else None,
+            )
         except Exception as e:
             logger.error(
                 "Failed to extract text layout for page %d of %s: %s",
@@ -229,7 +343,7 @@ def get_page_text(doc_id: str, page_number: int) -> Any:
             return jsonify({"error": "Fehler beim Extrahieren des Textes"}), 500
 
         resp = jsonify(layout)
-        resp.headers["Cache-Control"] = "private, max-age=300"
+        resp.headers["Cache-Control"] = _page_cache_control(version)
         return resp
 
     except Exception as e:
@@ -263,25 +377,13 @@ def get_annotation(doc_id: str, page_number: int) -> Any:
         }
     """
     try:
-        doc_info, err = _get_doc_or_error(doc_id)
+        # The annotation is joined into the document/page check
+        annotation, err = _get_doc_or_error(doc_id, page_number)
         if err is not None:
             return err
-        assert doc_info is not None
-
-        db = DatabaseManager()
-
-        # Validate page number
-        is_valid, error_msg = validate_page_number(page_number, doc_info["page_count"])
-        if not is_valid:
-            logger.warning(
-                "Invalid page number %d for document %s", page_number, doc_id
-            )
-            return jsonify({"error": error_msg}), 400
-
-        # Get annotation
-        annotation = db.get_annotation(doc_id, page_number)
+        assert annotation is not None
 
-        if annotation:
+        if annotation["updated_at"] is not None:
             return jsonify(
                 {
                     "note_text": annotation["note_text"],
@@ -329,21 +431,12 @@ def save_annotation(doc_id: str, page_number: int) -> Any:
         }
     """
     try:
-        doc_info, err = _get_doc_or_error(doc_id)
+        _, err = _get_doc_or_error(doc_id, page_number)
         if err is not None:
             return err
-        assert doc_info is not None
 
         db = DatabaseManager()
 
-        # Validate page number
-        is_valid, error_msg = validate_page_number(page_number, doc_info["page_count"])
-        if not is_valid:
-            logger.warning(
-                "Invalid page number %d for document %s", page_number, doc_id
-            )
-            return jsonify({"error": error_msg}), 400
-
         # Get note text from request
         data = request.get_json()
         if not data:
@@ -358,16 +451,12 @@ def save_annotation(doc_id: str, page_number: int) -> Any:
             logger.warning(f"Invalid note text: {error_msg}")
             return jsonify({"error": error_msg}), 400
 
-        # Save annotation
-        db.upsert_annotation(doc_id, page_number, note_text)
-
-        # Get updated annotation to return timestamp
-        annotation = db.get_annotation(doc_id, page_number)
-        assert annotation is not None
+        # Save annotation, the statement returns the new timestamp
+        updated_at = db.upsert_annotation(doc_id, page_number, note_text)
 
         logger.info(f"Saved annotation for page {page_number} of document {doc_id}")
 
-        return jsonify({"success": True, "updated_at": str(annotation["updated_at"])})
+        return jsonify({"success": True, "updated_at": updated_at})
 
     except Exception as e:
         logger.error(
@@ -377,6 +466,16 @@ def save_annotation(doc_id: str, page_number: int) -> Any:
         return jsonify({"error": "Interner Serverfehler"}), 500
 
 
+# Metadata fields: (JSON key, config key of the maximum length, label)
+_METADATA_LIMITS = (
+    ("first_name", "MAX_NAME_LENGTH", "Vorname"),
+    ("last_name", "MAX_NAME_LENGTH", "Nachname"),
+    ("title", "MAX_TITLE_LENGTH", "Titel"),
+    ("year", "MAX_YEAR_LENGTH", "Jahr"),
+    ("subject", "MAX_SUBJECT_LENGTH", "Thema"),
+)
+
+
 @viewer_bp.route("/api/metadata/<doc_id>", methods=["POST"])
 @login_required
 def update_metadata(doc_id: str) -> Any:
@@ -406,64 +505,20 @@ def update_metadata(doc_id: str) -> Any:
             logger.warning("No JSON data in request")
             return jsonify({"error": "Keine Daten gesendet"}), 400
 
-        # Extract metadata fields
-        first_name = data.get("first_name", "").strip()
-        last_name = data.get("last_name", "").strip()
-        title = data.get("title", "").strip()
-        year = data.get("year", "").strip()
-        subject = data.get("subject", "").strip()
-
-        # Validate input lengths
-        if len(first_name) > current_app.config["MAX_NAME_LENGTH"]:
-            return (
-                jsonify(
-                    {
-                        "error": f"Vorname zu lang (max. {current_app.config['MAX_NAME_LENGTH']} Zeichen)"
-                    }
-                ),
-                400,
-            )
-        if len(last_name) > current_app.config["MAX_NAME_LENGTH"]:
-            return (
-                jsonify(
-                    {
-                        "error": f"Nachname zu lang (max. {current_app.config['MAX_NAME_LENGTH']} Zeichen)"
-                    }
-                ),
-                400,
-            )
-        if len(title) > current_app.config["MAX_TITLE_LENGTH"]:
-            return (
-                jsonify(
-                    {
-                        "error": f"Titel zu lang (max. {current_app.config['MAX_TITLE_LENGTH']} Zeichen)"
-                    }
-                ),
-                400,
-            )
-        if len(year) > current_app.config["MAX_YEAR_LENGTH"]:
-            return (
-                jsonify(
-                    {
-                        "error": f"Jahr zu lang (max. {current_app.config['MAX_YEAR_LENGTH']} Zeichen)"
-                    }
-                ),
-                400,
-            )
-        if len(subject) > current_app.config["MAX_SUBJECT_LENGTH"]:
-            return (
-                jsonify(
-                    {
-                        "error": f"Thema zu lang (max. {current_app.config['MAX_SUBJECT_LENGTH']} Zeichen)"
-                    }
-                ),
-                400,
-            )
+        # Extract and validate metadata fields
+        config = current_app.config
+        values = {key: data.get(key, "").strip() for key, _, _ in _METADATA_LIMITS}
+        for key, limit_key, label in _METADATA_LIMITS:
+            if len(values[key]) > config[limit_key]:
+                return (
+                    jsonify(
+                        {"error": f"{label} zu lang (max. {config[limit_key]} Zeichen)"}
+                    ),
+                    400,
+                )
 
         # Update metadata in database
-        success = db.update_document_metadata(
-            doc_id, first_name, last_name, title, year, subject
-        )
+        success = db.update_document_metadata(doc_id, **values)
 
         if not success:
             logger.error(f"Failed to update metadata for document {doc_id}")
@@ -527,18 +582,7 @@ def replace_pdf(doc_id: str) -> Any:
             logger.warning(f"Invalid file type: {file.filename}")
             return jsonify({"error": error_msg}), 400
 
-        # Validate file size
-        file.seek(0, 2)  # Seek to end
-        file_size = file.tell()
-        file.seek(0)  # Reset to beginning
-
-        is_valid, error_msg = validate_file_size(
-            file_size, current_app.config["MAX_CONTENT_LENGTH"]
-        )
-        if not is_valid:
-            logger.warning(f"File too large: {file_size} bytes")
-            return jsonify({"error": error_msg}), 400
-
+        # The size limit is enforced by MAX_CONTENT_LENGTH before the view runs
         logger.info(f"Replacing PDF for document {doc_id}")
 
         file_path = Path(doc_info["file_path"])
@@ -546,16 +590,40 @@ def replace_pdf(doc_id: str) -> Any:
             logger.error("Document file not found: %s", file_path)
             return jsonify({"error": "Dokumentdatei nicht gefunden"}), 404
 
-        # Save new file (overwrites old one)
-        file.save(file_path)
+        # Store the upload under a temp name (hard link to the spool file,
+        # see utils/uploads.py) and validate it before it replaces the old
+        # PDF in one rename, so a broken upload never overwrites the document.
+        # The name is unique, so concurrent replaces don't clobber each other.
+        tmp_path = file_path.with_name(f".tmp-replace-{uuid4().hex}-{file_path.name}")
+        try:
+            save_upload(file, tmp_path)
+            try:
+                new_page_count = get_page_count(tmp_path)
+            except ValueError:
+                new_page_count = 0
+            if new_page_count < 1:
+                logger.error(f"Invalid replacement PDF: {file.filename}")
+                return (
+                    jsonify(
+                        {
+                            "error": "Ungültige PDF-Datei. Bitte versuchen Sie eine andere Datei."
+                        }
+                    ),
+                    400,
+                )
+            tmp_path.replace(file_path)
+        finally:
+            tmp_path.unlink(missing_ok=True)
         logger.info("Saved new PDF to: %s", file_path)
 
-        # Clear render + text caches so stale data is not served
+        # Free the old file's cached renders, text and page images (stale
+        # entries are never served anyway: all caches are keyed on mtime)
         clear_render_cache()
         clear_text_layout_cache()
+        clear_page_image_cache(
+            page_image_cache_dir(current_app.config["UPLOAD_FOLDER"], doc_id)
+        )
 
-        # Get new page count and update database
-        new_page_count = get_page_count(file_path)
         db.update_page_count(doc_id, new_page_count)
 
         logger.info("Successfully replaced PDF for document %s", doc_id)
@@ -648,6 +716,9 @@ def append_pdf(doc_id: str) -> Any:
 
         clear_render_cache()
         clear_text_layout_cache()
+        clear_page_image_cache(
+            page_image_cache_dir(current_app.config["UPLOAD_FOLDER"], doc_id)
+        )
 
         old_page_count = doc_info["page_count"]
         new_page_count = old_page_count + added_pages
@@ -699,7 +770,7 @@ def delete_page(doc_id: str, page_number: int) -> Any:
         page_number: Page number to delete (1-indexed)
 
     Returns:
-        JSON response with new page_count or error
+        JSON response with new page_count and page_version or error
     """
     try:
         doc_info, err = _get_doc_or_error(doc_id)
@@ -734,9 +805,12 @@ def delete_page(doc_id: str, page_number: int) -> Any:
         pdf_doc.close()
         tmp_path.replace(file_path)
 
-        # Clear render + text caches
+        # Free the old file's cached renders, text and page images
         clear_render_cache()
         clear_text_layout_cache()
+        clear_page_image_cache(
+            page_image_cache_dir(current_app.config["UPLOAD_FOLDER"], doc_id)
+        )
 
         # Delete annotation, renumber subsequent pages and decrement count atomically
         db.delete_annotation_and_renumber(doc_id, page_number)
@@ -748,7 +822,13 @@ def delete_page(doc_id: str, page_number: int) -> Any:
             f"new page count: {new_page_count}"
         )
 
-        return jsonify({"success": True, "page_count": new_page_count})
+        return jsonify(
+            {
+                "success": True,
+                "page_count": new_page_count,
+                "page_version": _file_version(doc_info["file_path"]),
+            }
+        )
 
     except Exception as e:
         logger.error(
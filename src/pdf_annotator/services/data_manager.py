@@ -5,11 +5,14 @@ Provides functionality to backup and restore all application data
 including documents, annotations, and PDF files.
 """
 
+import io
 import json
 import zipfile
+from collections.abc import Iterator
 from datetime import datetime
 from pathlib import Path
-from typing import Any
+from typing import IO, Any
+from uuid import uuid4
 
 from pdf_annotator.models.database import DatabaseManager
 from pdf_annotator.utils.logger import get_logger
@@ -17,6 +20,27 @@ from pdf_annotator.utils.logger import get_logger
 logger = get_logger(__name__)
 
 
+class _ChunkBuffer(io.RawIOBase):
+    """Unseekable write target for ZipFile that collects bytes until drained."""
+
+    def __init__(self) -> None:
+        self._chunks: list[bytes] = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data: Any) -> int:
+        chunk = bytes(data)
+        self._chunks.append(chunk)
+        return len(chunk)
+
+    def drain(self) -> bytes:
+        """Return and forget everything written since the last drain."""
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
 class DataManager:
     """
     Manages export and import of application data.
@@ -30,6 +54,7 @@ class DataManager:
     PDFS_FOLDER = "pdfs"
     EXPORT_VERSION = "1.0"
     MAX_UNCOMPRESSED_SIZE = 500 * 1024 * 1024  # 500 MB safety limit
+    EXPORT_CHUNK_SIZE = 1024 * 1024  # PDF bytes read per streamed chunk
 
     def __init__(self, upload_folder: Path, db: DatabaseManager | None = None):
         """
@@ -43,7 +68,10 @@ class DataManager:
         self.db = db or DatabaseManager()
 
     def export_data(
-        self, doc_ids: list[str] | None = None, output_path: Path | None = None
+        self,
+        doc_ids: list[str] | None = None,
+        output_path: Path | None = None,
+        documents: list[dict[str, Any]] | None = None,
     ) -> Path:
         """
         Export data to a ZIP archive.
@@ -53,6 +81,7 @@ class DataManager:
                     If not provided, exports all documents.
             output_path: Optional path for output file.
                         If not provided, creates timestamped file.
+            documents: Optional document rows to export (see iter_export_data)
 
         Returns:
             Path to created ZIP file
@@ -68,70 +97,119 @@ class DataManager:
                 self.upload_folder.parent / f"pdf_annotator_backup_{timestamp}.zip"
             )
 
+        with open(output_path, "wb") as f:
+            for chunk in self.iter_export_data(doc_ids, documents):
+                f.write(chunk)
+
+        return output_path
+
+    def iter_export_data(
+        self,
+        doc_ids: list[str] | None = None,
+        documents: list[dict[str, Any]] | None = None,
+    ) -> Iterator[bytes]:
+        """
+        Generate the export ZIP archive chunk by chunk.
+
+        The archive is written to an unseekable buffer that is drained after
+        every block, so neither the archive nor a whole PDF is held in memory
+        or on disk. metadata.json is written first, one document entry at a
+        time. PDFs are already compressed and are stored as-is (ZIP_STORED);
+        only metadata.json is deflated.
+
+        Args:
+            doc_ids: Optional list of document IDs to export.
+                    If not provided, exports all documents.
+            documents: Optional document rows to export (e.g. from
+                    get_all_documents), used instead of doc_ids so the
+                    documents are not fetched again one by one
+
+        Yields:
+            Consecutive parts of the ZIP archive
+
+        Example:
+            manager = DataManager(upload_folder)
+            return Response(manager.iter_export_data(doc_ids), mimetype="application/zip")
+        """
         # Collect documents to export
-        documents: list[dict[str, Any]]
-        if doc_ids:
-            raw_docs = [self.db.get_document(doc_id) for doc_id in doc_ids]
-            documents = [doc for doc in raw_docs if doc is not None]
-        else:
-            # Note: This is for backward compatibility with single-user mode
-            # In production, get_all_documents should not be called without user_id
-            documents = []
-        export_data: dict[str, Any] = {
+        if documents is None:
+            if doc_ids:
+                raw_docs = [self.db.get_document(doc_id) for doc_id in doc_ids]
+                documents = [doc for doc in raw_docs if doc is not None]
+            else:
+                # Note: This is for backward compatibility with single-user mode
+                # In production, get_all_documents should not be called without user_id
+                documents = []
+        header = {
             "version": self.EXPORT_VERSION,
             "exported_at": datetime.now().isoformat(),
-            "documents": [],
         }
 
+        # All annotations in one query instead of one per document
+        annotations_by_doc = self.db.get_annotations_by_document(
+            [doc["id"] for doc in documents]
+        )
+
         # Create ZIP archive
-        with zipfile.ZipFile(output_path, "w", zipfile.ZIP_DEFLATED) as zf:
+        buffer = _ChunkBuffer()
+        with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as zf:
+            # Write metadata JSON one document entry at a time, so neither
+            # the list of entries nor the whole JSON string is built. Only
+            # one archive member can be open for writing, so metadata.json
+            # comes before the PDFs.
+            with zf.open(self.METADATA_FILENAME, "w", force_zip64=True) as meta:
+                # header object without its closing brace, then the list
+                meta.write(json.dumps(header)[:-1].encode() + b', "documents": [\n')
+                for index, doc in enumerate(documents):
+                    doc_entry = {
+                        "id": doc["id"],
+                        "original_filename": doc["original_filename"],
+                        "page_count": doc["page_count"],
+                        "first_name": doc.get("first_name", ""),
+                        "last_name": doc.get("last_name", ""),
+                        "title": doc.get("title", ""),
+                        "year": doc.get("year", ""),
+                        "subject": doc.get("subject", ""),
+                        "upload_timestamp": str(doc.get("upload_timestamp", "")),
+                        "annotations": [
+                            {
+                                "page_number": ann["page_number"],
+                                "note_text": ann["note_text"],
+                                "created_at": str(ann.get("created_at", "")),
+                                "updated_at": str(ann.get("updated_at", "")),
+                            }
+                            # pop: the rows are not needed after this entry
+                            for ann in annotations_by_doc.pop(doc["id"], [])
+                        ],
+                    }
+                    if index:
+                        meta.write(b",\n")
+                    meta.write(json.dumps(doc_entry, ensure_ascii=False).encode())
+                    if chunk := buffer.drain():
+                        yield chunk
+                meta.write(b"\n]}\n")
+
             for doc in documents:
                 doc_id = doc["id"]
 
-                # Get all annotations for this document
-                annotations = self.db.get_all_annotations(doc_id)
-
-                # Build document entry
-                doc_entry = {
-                    "id": doc_id,
-                    "original_filename": doc["original_filename"],
-                    "page_count": doc["page_count"],
-                    "first_name": doc.get("first_name", ""),
-                    "last_name": doc.get("last_name", ""),
-                    "title": doc.get("title", ""),
-                    "year": doc.get("year", ""),
-                    "subject": doc.get("subject", ""),
-                    "upload_timestamp": str(doc.get("upload_timestamp", "")),
-                    "annotations": [
-                        {
-                            "page_number": ann["page_number"],
-                            "note_text": ann["note_text"],
-                            "created_at": str(ann.get("created_at", "")),
-                            "updated_at": str(ann.get("updated_at", "")),
-                        }
-                        for ann in annotations
-                    ],
-                }
-                export_data["documents"].append(doc_entry)
-
                 # Add PDF file to archive
                 pdf_path = Path(doc["file_path"])
                 if pdf_path.exists():
                     # Store with original doc_id as filename
                     archive_name = f"{self.PDFS_FOLDER}/{doc_id}.pdf"
-                    zf.write(pdf_path, archive_name)
-
-            # Write metadata JSON
-            zf.writestr(
-                self.METADATA_FILENAME,
-                json.dumps(export_data, indent=2, ensure_ascii=False),
-            )
+                    zinfo = zipfile.ZipInfo.from_file(pdf_path, archive_name)
+                    zinfo.compress_type = zipfile.ZIP_STORED
+                    with open(pdf_path, "rb") as src, zf.open(zinfo, "w") as dst:
+                        while block := src.read(self.EXPORT_CHUNK_SIZE):
+                            dst.write(block)
+                            yield buffer.drain()
 
-        return output_path
+        # Central directory
+        yield buffer.drain()
 
     def import_data(
         self,
-        zip_path: Path,
+        zip_path: Path | IO[bytes],
         user_id: str | None = None,
         merge: bool = False,
         debug: bool = False,
@@ -140,7 +218,8 @@ class DataManager:
         Import data from a ZIP archive.
 
         Args:
-            zip_path: Path to ZIP file to import
+            zip_path: Path to ZIP file to import, or a seekable binary file
+                      object (e.g. the uploaded file's stream)
             user_id: Optional user ID to assign to imported documents (multi-user mode)
             merge: If True, merge with existing data. If False, skip existing documents.
             debug: If True, print debug information (for testing)
@@ -165,102 +244,110 @@ class DataManager:
             "annotations_imported": 0,
         }
 
-        with zipfile.ZipFile(zip_path, "r") as zf:
-            # Check total uncompressed size to prevent ZIP bombs
-            total_size = sum(info.file_size for info in zf.infolist())
-            if total_size > self.MAX_UNCOMPRESSED_SIZE:
-                raise ValueError(
-                    f"ZIP-Inhalt zu gross ({total_size / (1024 * 1024):.0f} MB). "
-                    f"Maximum: {self.MAX_UNCOMPRESSED_SIZE / (1024 * 1024):.0f} MB"
-                )
+        # (doc_id, pdf_dest, doc_data) of the extracted PDFs; removed again
+        # if the import fails
+        written: list[tuple[str, Path, dict[str, Any]]] = []
 
-            # Read and validate metadata
-            try:
-                metadata_content = zf.read(self.METADATA_FILENAME)
-                metadata = json.loads(metadata_content)
-            except KeyError as e:
-                raise ValueError("Invalid backup file: metadata.json not found") from e
-            except json.JSONDecodeError as e:
-                raise ValueError(
-                    "Invalid backup file: metadata.json is corrupted"
-                ) from e
-
-            # Check version compatibility
-            version = metadata.get("version", "0.0")
-            if not self._is_version_compatible(version):
-                raise ValueError(f"Incompatible backup version: {version}")
-
-            # Process each document
-            for doc_idx, doc_data in enumerate(metadata.get("documents", []), 1):
-                from uuid import uuid4
-
-                # IMPORTANT: Always generate a new UUID for imports.
-                # This allows multiple users to import the same backup independently;
-                # each user gets their own copy with a unique doc_id.
-                original_doc_id = doc_data.get("id")
-                doc_id = str(uuid4())
-
-                logger.debug("[Import] Doc #%d: %s → %s", doc_idx, original_doc_id, doc_id)
-
-                # Extract PDF file - try original doc_id first, then new doc_id
-                pdf_content = None
-                pdf_archive_path = f"{self.PDFS_FOLDER}/{original_doc_id}.pdf"
+        try:
+            with zipfile.ZipFile(zip_path, "r") as zf:
+                # Check total uncompressed size to prevent ZIP bombs
+                total_size = sum(info.file_size for info in zf.infolist())
+                if total_size > self.MAX_UNCOMPRESSED_SIZE:
+                    raise ValueError(
+                        f"ZIP-Inhalt zu gross ({total_size / (1024 * 1024):.0f} MB). "
+                        f"Maximum: {self.MAX_UNCOMPRESSED_SIZE / (1024 * 1024):.0f} MB"
+                    )
+
+                # Read and validate metadata
                 try:
-                    pdf_content = zf.read(pdf_archive_path)
-                except KeyError:
-                    pdf_archive_path = f"{self.PDFS_FOLDER}/{doc_id}.pdf"
+                    metadata_content = zf.read(self.METADATA_FILENAME)
+                    metadata = json.loads(metadata_content)
+                except KeyError as e:
+                    raise ValueError("Invalid backup file: metadata.json not found") from e
+                except json.JSONDecodeError as e:
+                    raise ValueError(
+                        "Invalid backup file: metadata.json is corrupted"
+                    ) from e
+
+                # Check version compatibility
+                version = metadata.get("version", "0.0")
+                if not self._is_version_compatible(version):
+                    raise ValueError(f"Incompatible backup version: {version}")
+
+                # Process each document
+                for doc_idx, doc_data in enumerate(metadata.get("documents", []), 1):
+                    # IMPORTANT: Always generate a new UUID for imports.
+                    # This allows multiple users to import the same backup independently;
+                    # each user gets their own copy with a unique doc_id.
+                    original_doc_id = doc_data.get("id")
+                    doc_id = str(uuid4())
+
+                    logger.debug("[Import] Doc #%d: %s → %s", doc_idx, original_doc_id, doc_id)
+
+                    # Extract PDF file - try original doc_id first, then new doc_id
+                    pdf_content = None
+                    pdf_archive_path = f"{self.PDFS_FOLDER}/{original_doc_id}.pdf"
                     try:
                         pdf_content = zf.read(pdf_archive_path)
                     except KeyError:
-                        pdf_content = None
+                        pdf_archive_path = f"{self.PDFS_FOLDER}/{doc_id}.pdf"
+                        try:
+                            pdf_content = zf.read(pdf_archive_path)
+                        except KeyError:
+                            pdf_content = None
+
+                    if pdf_content is None:
+                        logger.debug("[Import] Skipped doc %s: PDF not found in archive", original_doc_id)
+                        stats["documents_skipped"] += 1
+                        continue
 
-                if pdf_content is None:
-                    logger.debug("[Import] Skipped doc %s: PDF not found in archive", original_doc_id)
-                    stats["documents_skipped"] += 1
-                    continue
+                    try:
+                        pdf_dest = self.upload_folder / f"{doc_id}.pdf"
 
-                try:
-                    pdf_dest = self.upload_folder / f"{doc_id}.pdf"
+                        # Ensure destination is safe (no path traversal)
+                        if not pdf_dest.resolve().is_relative_to(self.upload_folder.resolve()):
+                            logger.warning("[Import] Path traversal blocked for doc %s", original_doc_id)
+                            stats["documents_skipped"] += 1
+                            continue
 
-                    # Ensure destination is safe (no path traversal)
-                    if not pdf_dest.resolve().is_relative_to(self.upload_folder.resolve()):
-                        logger.warning("[Import] Path traversal blocked for doc %s", original_doc_id)
+                        pdf_dest.write_bytes(pdf_content)
+                    except OSError as e:
+                        logger.warning("[Import] File write error for doc %s: %s", original_doc_id, e)
                         stats["documents_skipped"] += 1
                         continue
 
-                    pdf_dest.write_bytes(pdf_content)
-                except OSError as e:
-                    logger.warning("[Import] File write error for doc %s: %s", original_doc_id, e)
-                    stats["documents_skipped"] += 1
-                    continue
-
-                # Create document in database with new UUID
-                target_user_id = user_id or "imported"
-                self.db.create_document(
-                    user_id=target_user_id,
-                    filename=doc_data["original_filename"],
-                    file_path=str(pdf_dest),
-                    page_count=doc_data["page_count"],
-                    first_name=doc_data.get("first_name", ""),
-                    last_name=doc_data.get("last_name", ""),
-                    title=doc_data.get("title", ""),
-                    year=doc_data.get("year", ""),
-                    subject=doc_data.get("subject", ""),
-                    doc_id=doc_id,
-                )
-
-                stats["documents_imported"] += 1
-                logger.debug("[Import] Imported doc %s successfully", doc_id)
-
-                # Import annotations
-                for ann_data in doc_data.get("annotations", []):
-                    self.db.upsert_annotation(
+                    written.append((doc_id, pdf_dest, doc_data))
+
+            # One transaction (one commit) for all documents and annotations
+            # instead of one per row; on failure no document is imported
+            target_user_id = user_id or "imported"
+            with self.db.get_connection():
+                for doc_id, pdf_dest, doc_data in written:
+                    self.db.create_document(
+                        user_id=target_user_id,
+                        filename=doc_data["original_filename"],
+                        file_path=str(pdf_dest),
+                        page_count=doc_data["page_count"],
+                        first_name=doc_data.get("first_name", ""),
+                        last_name=doc_data.get("last_name", ""),
+                        title=doc_data.get("title", ""),
+                        year=doc_data.get("year", ""),
+                        subject=doc_data.get("subject", ""),
                         doc_id=doc_id,
-                        page_number=ann_data["page_number"],
-                        note_text=ann_data["note_text"],
                     )
-                    stats["annotations_imported"] += 1
-
+                    annotations = [
+                        (ann_data["page_number"], ann_data["note_text"])
+                        for ann_data in doc_data.get("annotations", [])
+                    ]
+                    self.db.upsert_annotations(doc_id, annotations)
+                    stats["documents_imported"] += 1
+                    stats["annotations_imported"] += len(annotations)
+        except BaseException:
+            for _, pdf_dest, _ in written:
+                pdf_dest.unlink(missing_ok=True)
+            raise
+
+        logger.debug("[Import] Imported %d documents", stats["documents_imported"])
         return stats
 
     def _update_document_id(self, doc_data: dict, pdf_dest: Path) -> None:
@@ -300,13 +387,17 @@ class DataManager:
         except (ValueError, AttributeError):
             return False
 
-    def get_export_info(self, doc_ids: list[str] | None = None) -> dict[str, Any]:
+    def get_export_info(
+        self, doc_ids: list[str] | None = None, user_id: str | None = None
+    ) -> dict[str, Any]:
         """
         Get information about what would be exported.
 
         Args:
             doc_ids: Optional list of document IDs to include in info.
                     If not provided, includes all documents.
+            user_id: Optional user ID; summarizes all documents of this user
+                    with a single query (takes precedence over doc_ids)
 
         Returns:
             dict with export preview:
@@ -314,26 +405,36 @@ class DataManager:
                 - annotation_count: Total annotations
                 - estimated_size_mb: Estimated archive size
         """
-        documents: list[dict[str, Any]]
-        if doc_ids:
-            raw_docs = [self.db.get_document(doc_id) for doc_id in doc_ids]
-            documents = [doc for doc in raw_docs if doc is not None]
+        if user_id is not None:
+            summary = self.db.get_export_summary(user_id)
+            document_count = summary["document_count"]
+            total_annotations = summary["annotation_count"]
+            file_paths = summary["file_paths"]
         else:
-            documents = []
+            documents: list[dict[str, Any]]
+            if doc_ids:
+                raw_docs = [self.db.get_document(doc_id) for doc_id in doc_ids]
+                documents = [doc for doc in raw_docs if doc is not None]
+            else:
+                documents = []
+
+            document_count = len(documents)
+            annotations_by_doc = self.db.get_annotations_by_document(
+                [doc["id"] for doc in documents]
+            )
+            total_annotations = sum(len(anns) for anns in annotations_by_doc.values())
+            file_paths = [doc["file_path"] for doc in documents]
 
-        total_annotations = 0
+        # The PDFs are rewritten by page edits, so their size is read from disk
         total_size = 0
-
-        for doc in documents:
-            annotations = self.db.get_all_annotations(doc["id"])
-            total_annotations += len(annotations)
-
-            pdf_path = Path(doc["file_path"])
-            if pdf_path.exists():
-                total_size += pdf_path.stat().st_size
+        for file_path in file_paths:
+            try:
+                total_size += Path(file_path).stat().st_size
+            except OSError:
+                pass
 
         return {
-            "document_count": len(documents),
+            "document_count": document_count,
             "annotation_count": total_annotations,
             "estimated_size_mb": round(total_size / (1024 * 1024), 2),
         }
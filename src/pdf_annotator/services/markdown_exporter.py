@@ -60,51 +60,39 @@ def export_to_markdown(doc_id: str, output_path: Path, db: DatabaseManager) -> b
             logger.error(f"Document {doc_id} not found")
             return False
 
-        # Get all annotations
-        annotations = db.get_all_annotations(doc_id)
-
-        # Filter out empty annotations
-        annotations = [ann for ann in annotations if ann["note_text"].strip()]
-
-        logger.info(f"Exporting {len(annotations)} non-empty annotations to Markdown")
-
-        # Build Markdown content
-        lines = []
+        # Ensure output directory exists
+        output_path.parent.mkdir(parents=True, exist_ok=True)
 
-        # Title
-        original_filename = doc_info["original_filename"]
-        lines.append(f"# Notizen zu {original_filename}")
-        lines.append("")
+        # Write section by section while reading the annotations, so neither
+        # the rows nor the Markdown text are held in memory as a whole
+        exported = 0
+        with output_path.open("w", encoding="utf-8") as f:
+            # Title
+            f.write(f"# Notizen zu {doc_info['original_filename']}\n\n")
 
-        if not annotations:
-            lines.append("_Keine Notizen vorhanden._")
-        else:
-            # Add each annotation
-            for ann in annotations:
-                page_number = ann["page_number"]
-                note_text = ann["note_text"]
-                updated_at = ann["updated_at"]
+            for ann in db.iter_annotations(doc_id):
+                # Skip empty annotations
+                note_text = ann["note_text"].strip()
+                if not note_text:
+                    continue
 
                 # Convert to datetime and format timestamp
-                updated_dt = parse_timestamp(updated_at)
+                updated_dt = parse_timestamp(ann["updated_at"])
                 timestamp = format_timestamp(updated_dt)
 
-                # Add annotation section
-                lines.append(f"## Seite {page_number} - {timestamp}")
-                lines.append("")
-                lines.append(note_text.strip())
-                lines.append("")
+                # Add annotation section (blank line between sections)
+                if exported:
+                    f.write("\n")
+                f.write(f"## Seite {ann['page_number']} - {timestamp}\n\n")
+                f.write(f"{note_text}\n")
+                exported += 1
 
-        # Join lines
-        markdown_content = "\n".join(lines)
+            if not exported:
+                f.write("_Keine Notizen vorhanden._")
 
-        # Ensure output directory exists
-        output_path.parent.mkdir(parents=True, exist_ok=True)
-
-        # Write to file
-        output_path.write_text(markdown_content, encoding="utf-8")
-
-        logger.info(f"Successfully exported to Markdown: {output_path}")
+        logger.info(
+            f"Successfully exported {exported} annotations to Markdown: {output_path}"
+        )
         return True
 
     except Exception as e:
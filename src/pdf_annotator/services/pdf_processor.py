@@ -4,6 +4,12 @@ PDF Processing module for PDF Annotator.
 Handles PDF rendering and validation using PyMuPDF (fitz).
 """
 
+import os
+import shutil
+import threading
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
 from functools import lru_cache
 from pathlib import Path
 
@@ -11,8 +17,17 @@ import fitz  # PyMuPDF
 
 from pdf_annotator.utils.logger import get_logger
 
+try:
+    import fcntl
+except ImportError:  # Windows (desktop mode): no cross-process render lock
+    fcntl = None
+
 logger = get_logger(__name__)
 
+# A page image cache hit moves the file's mtime (its LRU position) forward
+# at most this often
+PAGE_IMAGE_TOUCH_INTERVAL_SECONDS = 3600
+
 
 def validate_pdf(file_path: Path) -> bool:
     """
@@ -30,6 +45,9 @@ def validate_pdf(file_path: Path) -> bool:
     """
     try:
         with fitz.open(str(file_path)) as doc:
+            if not doc.is_pdf:
+                logger.warning("Not a PDF document: %s", file_path)
+                return False
             page_count = len(doc)
             logger.debug("Validated PDF: %s (%d pages)", file_path.name, page_count)
             return page_count > 0
@@ -51,12 +69,18 @@ def get_page_count(file_path: Path) -> int:
     Raises:
         ValueError: If file is not a valid PDF
 
+    The count is read from the page tree root (/Count), the pages themselves
+    are not loaded. MuPDF also opens images and e-books, so documents that
+    are not PDFs (doc.is_pdf) are rejected.
+
     Example:
         page_count = get_page_count(Path("document.pdf"))
         print(f"Document has {page_count} pages")
     """
     try:
         with fitz.open(str(file_path)) as doc:
+            if not doc.is_pdf:
+                raise ValueError("not a PDF document")
             return len(doc)
     except Exception as e:
         logger.error(f"Failed to get page count for {file_path}: {e}")
@@ -96,11 +120,16 @@ def get_page_dimensions(file_path: Path, page_num: int) -> tuple[float, float]:
 
 
 @lru_cache(maxsize=50)
-def _render_page_cached(file_path: str, page_num: int, dpi: int) -> bytes:
+def _render_page_cached(
+    file_path: str, page_num: int, dpi: int, mtime_ns: int
+) -> bytes:
     """
     Internal cached page rendering. Raises on failure so errors are never cached.
 
     File path must be a string (not Path) for LRU cache compatibility.
+    mtime_ns is only part of the cache key: a PDF that was replaced or edited
+    (in place, by any worker process) gets new entries, so this process never
+    returns a render of the old file even if its cache was not cleared.
     """
     logger.debug("Rendering page %d from %s", page_num, Path(file_path).name)
     doc = fitz.open(file_path)
@@ -129,7 +158,9 @@ def _render_page_cached(file_path: str, page_num: int, dpi: int) -> bytes:
     return bytes(png_bytes)
 
 
-def render_page_to_image(file_path: str, page_num: int, dpi: int = 300) -> bytes | None:
+def render_page_to_image(
+    file_path: str, page_num: int, dpi: int = 300, mtime_ns: int | None = None
+) -> bytes | None:
     """
     Render PDF page to PNG image.
 
@@ -140,6 +171,8 @@ def render_page_to_image(file_path: str, page_num: int, dpi: int = 300) -> bytes
         file_path: Path to PDF file (as string)
         page_num: Page number (1-indexed)
         dpi: Resolution for rendering (default: 300)
+        mtime_ns: The PDF's st_mtime_ns if the caller already has it
+                  (read from the file otherwise); part of the cache key
 
     Returns:
         bytes: PNG image data or None on error
@@ -151,7 +184,9 @@ def render_page_to_image(file_path: str, page_num: int, dpi: int = 300) -> bytes
                 f.write(image_bytes)
     """
     try:
-        return _render_page_cached(file_path, page_num, dpi)
+        if mtime_ns is None:
+            mtime_ns = os.stat(file_path).st_mtime_ns
+        return _render_page_cached(file_path, page_num, dpi, mtime_ns)
     except Exception as e:
         logger.error("Failed to render page %d from %s: %s", page_num, file_path, e)
         return None
@@ -161,7 +196,9 @@ def clear_render_cache() -> None:
     """
     Clear the LRU cache for rendered pages.
 
-    Useful for freeing memory or when PDF files are updated.
+    Frees the memory of renders of a PDF that was updated. Only this
+    process's cache is cleared; other workers never serve the old renders
+    anyway, since the cache is keyed on the PDF's mtime.
 
     Example:
         clear_render_cache()
@@ -171,24 +208,212 @@ def clear_render_cache() -> None:
     logger.info("PDF render cache cleared")
 
 
-@lru_cache(maxsize=50)
-def get_page_text_layout(file_path: str, page_num: int) -> dict:
+def page_image_cache_dir(upload_folder: Path, doc_id: str) -> Path:
     """
-    Extract word-level text with bounding boxes for a PDF page.
+    Return the directory holding the rendered page images of a document.
 
-    Used to build a selectable/copyable text overlay on top of the raster
-    page image. Coordinates are in PDF points, matching get_page_dimensions.
+    Args:
+        upload_folder: Configured UPLOAD_FOLDER
+        doc_id: UUID of document
+
+    Returns:
+        Path: <upload_folder>/cache/<doc_id>
+    """
+    return Path(upload_folder) / "cache" / doc_id
+
+
+def get_cached_page_image(
+    file_path: str, page_num: int, dpi: int, cache_dir: Path
+) -> Path | None:
+    """
+    Return a PNG file of a PDF page, rendering it on first request.
+
+    The file name contains the PDF's mtime, and a miss is rendered through
+    the render cache keyed on the same mtime, so after a replace, append or
+    page deletion no worker process can serve or write an image of the old
+    file. This holds without clear_render_cache(), which only clears the
+    calling process's memory.
+    Images are written to a temp name and renamed, so concurrent requests
+    never see a partial file. Requests for an image that is being rendered
+    wait for that render (see _render_lock) instead of starting their own.
 
     Args:
-        file_path: Path to PDF file (as string, for LRU cache compatibility)
+        file_path: Path to PDF file (as string)
         page_num: Page number (1-indexed)
+        dpi: Resolution for rendering
+        cache_dir: Directory for this document's images (page_image_cache_dir)
 
-    Raises:
-        ValueError: If page number is invalid
+    Returns:
+        Path to the PNG file, or None if rendering or writing failed
+
+    Example:
+        image_path = get_cached_page_image("/path/doc.pdf", 1, 150, cache_dir)
+        if image_path:
+            return send_file(image_path, mimetype="image/png")
+    """
+    try:
+        mtime_ns = os.stat(file_path).st_mtime_ns
+    except OSError as e:
+        logger.error("Cannot stat %s: %s", file_path, e)
+        return None
+
+    image_path = cache_dir / f"p{page_num}-{dpi}dpi-{mtime_ns}.png"
+    if _touch(image_path):
+        return image_path
+
+    with _render_lock(image_path):
+        if image_path.is_file():
+            return image_path  # rendered while we waited for the lock
+
+        image_bytes = render_page_to_image(file_path, page_num, dpi, mtime_ns)
+        if image_bytes is None:
+            return None
+
+        tmp_path = image_path.with_name(
+            f".{image_path.name}.{os.getpid()}-{threading.get_ident()}"
+        )
+        try:
+            cache_dir.mkdir(parents=True, exist_ok=True)
+            tmp_path.write_bytes(image_bytes)
+            tmp_path.replace(image_path)
+        except OSError as e:
+            logger.warning("Could not cache page image %s: %s", image_path, e)
+            tmp_path.unlink(missing_ok=True)
+            return None
+    return image_path
+
+
+def _touch(image_path: Path) -> bool:
+    """
+    Report whether a cached image exists and mark it as recently used.
+
+    prune_page_image_cache evicts by mtime, because atime is not updated
+    on reads on relatime/noatime mounts (the Linux and Docker default).
+    The mtime is moved forward at most every PAGE_IMAGE_TOUCH_INTERVAL_SECONDS,
+    so a hit costs no write and the file's ETag/Last-Modified (derived
+    from the mtime by Werkzeug and nginx) stay stable in between.
+    """
+    try:
+        mtime = image_path.stat().st_mtime
+    except OSError:
+        return False
+    if time.time() - mtime > PAGE_IMAGE_TOUCH_INTERVAL_SECONDS:
+        try:
+            os.utime(image_path)
+        except OSError as e:
+            logger.debug("Could not touch %s: %s", image_path, e)
+    return True
+
+
+@contextmanager
+def _render_lock(image_path: Path) -> Iterator[None]:
+    """
+    Hold an exclusive lock for rendering one page image.
+
+    flock() on a lock file works across threads and worker processes, so a
+    page opened by several clients at once is rendered a single time. The
+    lock file lives in the cache root, next to the document directories
+    (which prune_page_image_cache only looks into), and is removed by the
+    holder; waiters re-check the image once they get the lock, so a race
+    on the removed file costs at most one extra render. Without fcntl
+    (Windows) or if the lock file cannot be created, renders are not
+    coalesced.
+    """
+    if fcntl is None:
+        yield
+        return
+
+    cache_dir = image_path.parent
+    lock_path = cache_dir.with_name(f".{cache_dir.name}-{image_path.stem}.lock")
+    try:
+        lock_path.parent.mkdir(parents=True, exist_ok=True)
+        lock_file = open(lock_path, "ab")
+    except OSError as e:
+        logger.debug("No render lock for %s: %s", image_path, e)
+        yield
+        return
+
+    with lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            lock_path.unlink(missing_ok=True)
+
+
+def clear_page_image_cache(cache_dir: Path) -> None:
+    """
+    Remove all cached page images of a document.
+
+    Old images are never served (see get_cached_page_image); this only
+    frees the disk space after a document is changed or deleted.
+
+    Args:
+        cache_dir: Directory from page_image_cache_dir
+    """
+    shutil.rmtree(cache_dir, ignore_errors=True)
+
+
+def prune_page_image_cache(upload_folder: Path, max_bytes: int) -> int:
+    """
+    Delete least recently used page images until the cache fits max_bytes.
+
+    Files are ordered by mtime, which get_cached_page_image moves forward
+    on cache hits (at most hourly), so images that are still being viewed
+    are kept. A deleted
+    image is simply rendered again on the next request.
+
+    Args:
+        upload_folder: Configured UPLOAD_FOLDER
+        max_bytes: Size limit for all cached page images together
 
     Returns:
-        dict with page_width, page_height (points) and lines, each a list
-        of words with text and x0/y0/x1/y1 bounding box in points.
+        int: Number of files removed
+    """
+    cache_root = Path(upload_folder) / "cache"
+    entries: list[tuple[float, int, str]] = []
+    total = 0
+    try:
+        # scandir: stat results come with the directory entries
+        with os.scandir(cache_root) as doc_dirs:
+            for doc_dir in doc_dirs:
+                if not doc_dir.is_dir():
+                    continue
+                try:
+                    with os.scandir(doc_dir.path) as files:
+                        for entry in files:
+                            if entry.is_file():
+                                st = entry.stat()
+                                entries.append((st.st_mtime, st.st_size, entry.path))
+                                total += st.st_size
+                except FileNotFoundError:
+                    continue  # document deleted meanwhile
+    except FileNotFoundError:
+        return 0
+
+    removed = 0
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            os.unlink(path)
+            removed += 1
+        except FileNotFoundError:
+            pass
+        total -= size
+
+    if removed:
+        logger.info("Pruned %d page images from %s", removed, cache_root)
+    return removed
+
+
+@lru_cache(maxsize=50)
+def _page_text_layout_cached(file_path: str, page_num: int, mtime_ns: int) -> dict:
+    """
+    Internal cached text layout extraction.
+
+    Keyed on mtime_ns like _render_page_cached, so a PDF replaced by another
+    worker process never gets the old file's words served from this cache.
     """
     doc = fitz.open(file_path)
     try:
@@ -220,15 +445,42 @@ def get_page_text_layout(file_path: str, page_num: int) -> dict:
         doc.close()
 
 
+def get_page_text_layout(
+    file_path: str, page_num: int, mtime_ns: int | None = None
+) -> dict:
+    """
+    Extract word-level text with bounding boxes for a PDF page.
+
+    Used to build a selectable/copyable text overlay on top of the raster
+    page image. Coordinates are in PDF points, matching get_page_dimensions.
+
+    Args:
+        file_path: Path to PDF file (as string, for LRU cache compatibility)
+        page_num: Page number (1-indexed)
+        mtime_ns: The PDF's st_mtime_ns if the caller already has it
+                  (read from the file otherwise); part of the cache key
+
+    Raises:
+        ValueError: If page number is invalid
+
+    Returns:
+        dict with page_width, page_height (points) and lines, each a list
+        of words with text and x0/y0/x1/y1 bounding box in points.
+    """
+    if mtime_ns is None:
+        mtime_ns = os.stat(file_path).st_mtime_ns
+    return _page_text_layout_cached(file_path, page_num, mtime_ns)
+
+
 def clear_text_layout_cache() -> None:
     """
     Clear the LRU cache for extracted text layouts.
 
-    Must be called alongside clear_render_cache() whenever a PDF's content
-    changes (replace/append/delete page), otherwise stale word/bbox data
-    could be served after the image cache has already been invalidated.
+    Called alongside clear_render_cache() after a PDF's content changes
+    (replace/append/delete page) to free the old entries; correctness does
+    not depend on it, since the cache is keyed on the PDF's mtime.
     """
-    get_page_text_layout.cache_clear()
+    _page_text_layout_cached.cache_clear()
     logger.info("PDF text layout cache cleared")
 
 
@@ -13,6 +13,8 @@
     const viewerData = document.getElementById('viewer-data');
     const docId = viewerData.dataset.docId;
     let pageCount = parseInt(viewerData.dataset.pageCount);
+    // Changes whenever the PDF is rewritten; versioned page URLs are cached long
+    let pageVersion = viewerData.dataset.pageVersion;
 
     // DOM elements
     const pdfPage = document.getElementById('pdf-page');
@@ -69,6 +71,29 @@
     let currentZoomIndex = 2; // 100%
     let fitToWidth = true; // Default: fit to container width
 
+    /**
+     * Build the (versioned, long-cacheable) image URL of a page
+     * @param {number} pageNumber - Page number (1-indexed)
+     * @returns {string} URL of the page image
+     */
+    function pageImageUrl(pageNumber) {
+        return `/viewer/api/page/${docId}/${pageNumber}?v=${pageVersion}`;
+    }
+
+    /**
+     * Load the next page image into the browser cache, so paging forward
+     * does not wait for the server to render it. Only one page ahead:
+     * page images are rate-limited per minute.
+     * @param {number} pageNumber - Page number to prefetch (1-indexed)
+     */
+    function prefetchPage(pageNumber) {
+        if (pageNumber > pageCount) {
+            return;
+        }
+        const img = new Image();
+        img.src = pageImageUrl(pageNumber);
+    }
+
     /**
      * Load PDF page image
      * @param {number} pageNumber - Page number to load (1-indexed)
@@ -79,7 +104,7 @@
         pdfPage.style.display = 'none';
 
         // Build URL
-        const pageUrl = `/viewer/api/page/${docId}/${pageNumber}`;
+        const pageUrl = pageImageUrl(pageNumber);
 
         // Load image
         const img = new Image();
@@ -88,6 +113,10 @@
             pdfPage.style.display = 'block';
             pageLoading.style.display = 'none';
             syncTextLayerGeometry();
+            // Only once the current page is shown, so it never competes
+            if (pageNumber === currentPage) {
+                prefetchPage(pageNumber + 1);
+            }
         };
         img.onerror = function() {
             pageLoading.innerHTML = '';
@@ -117,7 +146,7 @@
      * @param {number} pageNumber - Page number (1-indexed)
      */
     function loadTextLayer(pageNumber) {
-        const textUrl = `/viewer/api/page/${docId}/${pageNumber}/text`;
+        const textUrl = `/viewer/api/page/${docId}/${pageNumber}/text?v=${pageVersion}`;
         fetch(textUrl)
             .then(response => {
                 if (!response.ok) {
@@ -799,6 +828,7 @@
                 })
                 .then(function(data) {
                     pageCount = data.page_count;
+                    pageVersion = data.page_version;
                     document.getElementById('total-pages').textContent = pageCount;
 
                     // Adjust current page if we deleted the last page
@@ -10,13 +10,40 @@ responses.
 import shutil
 from pathlib import Path
 from typing import Any
+from urllib.parse import quote
 
-from flask import current_app, jsonify, send_file
+from flask import Response, current_app, jsonify, request, send_file
+from werkzeug.utils import send_file as werkzeug_send_file
 
 from pdf_annotator.utils.logger import get_logger
 
 logger = get_logger(__name__)
 
+# Internal nginx locations (X_ACCEL_REDIRECT) for the served folders
+X_ACCEL_LOCATIONS = {
+    "UPLOAD_FOLDER": "/_protected/uploads/",
+    "EXPORT_FOLDER": "/_protected/exports/",
+}
+
+
+def x_accel_uri(path: Path) -> str | None:
+    """
+    Map a file to its internal nginx URI for X-Accel-Redirect.
+
+    Args:
+        path: File inside UPLOAD_FOLDER or EXPORT_FOLDER
+
+    Returns:
+        URI such as "/_protected/exports/<name>", or None if the file lies
+        outside the mapped folders
+    """
+    resolved = path.resolve()
+    for config_key, location in X_ACCEL_LOCATIONS.items():
+        folder = Path(current_app.config[config_key]).resolve()
+        if resolved.is_relative_to(folder):
+            return location + quote(resolved.relative_to(folder).as_posix())
+    return None
+
 
 def send_file_response(path: Path, filename: str, mimetype: str) -> Any:
     """
@@ -32,6 +59,9 @@ def send_file_response(path: Path, filename: str, mimetype: str) -> Any:
         filename: Filename to present to the user
         mimetype: MIME type for the browser response (ignored in DESKTOP_MODE)
 
+    With X_ACCEL_REDIRECT enabled, files from the upload and export
+    folders are answered with headers only and nginx sends the body.
+
     Returns:
         Flask response: JSON with the saved path (DESKTOP_MODE) or a file
         download (default)
@@ -44,6 +74,52 @@ def send_file_response(path: Path, filename: str, mimetype: str) -> Any:
         logger.info(f"Desktop-Mode export saved to: {target}")
         return jsonify({"success": True, "filename": filename, "path": str(target)})
 
+    uri = x_accel_uri(path) if current_app.config["X_ACCEL_REDIRECT"] else None
+    if uri:
+        return _x_accel_response(
+            path, uri, mimetype, as_attachment=True, download_name=filename
+        )
+
+    # ETag/Last-Modified are set and a matching If-None-Match gets a 304.
+    # No max_age: werkzeug would mark the response public, and the original
+    # PDF is rewritten when a page is deleted, so clients must revalidate.
     return send_file(
         path, as_attachment=True, download_name=filename, mimetype=mimetype
     )
+
+
+def send_inline_file(path: Path, mimetype: str) -> Response:
+    """
+    Send a file for display in the browser (e.g. a cached page image).
+
+    With X_ACCEL_REDIRECT enabled and the file inside a mapped folder,
+    nginx sends the body; otherwise it is streamed with ETag support.
+
+    Args:
+        path: File to send
+        mimetype: MIME type of the file
+
+    Returns:
+        Flask response with Content-Disposition: inline
+    """
+    uri = x_accel_uri(path) if current_app.config["X_ACCEL_REDIRECT"] else None
+    if uri:
+        return _x_accel_response(path, uri, mimetype)
+    return send_file(path, mimetype=mimetype)
+
+
+def _x_accel_response(path: Path, uri: str, mimetype: str, **kwargs: Any) -> Response:
+    """Build a headers-only response that hands the file to nginx."""
+    # use_x_sendfile builds all file headers without opening the file
+    response = werkzeug_send_file(
+        path,
+        request.environ,
+        mimetype=mimetype,
+        use_x_sendfile=True,
+        response_class=current_app.response_class,
+        _root_path=current_app.root_path,
+        **kwargs,
+    )
+    del response.headers["X-Sendfile"]
+    response.headers["X-Accel-Redirect"] = uri
+    return response
@@ -0,0 +1,104 @@
+"""
+File upload helper for PDF Annotator.
+
+Spools uploaded files into UPLOAD_FOLDER instead of the system temp
+directory, so a PDF upload can be stored under its final name with a hard
+link instead of a second copy of its bytes.
+"""
+
+import os
+import shutil
+import stat
+import tempfile
+from pathlib import Path
+from typing import IO
+
+from flask import Request, current_app
+from werkzeug.datastructures import FileStorage
+
+from pdf_annotator.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class UploadRequest(Request):
+    """Request class whose file uploads are spooled inside UPLOAD_FOLDER."""
+
+    def _get_file_stream(
+        self,
+        total_content_length: int | None,
+        content_type: str | None,
+        filename: str | None = None,
+        content_length: int | None = None,
+    ) -> IO[bytes]:
+        """
+        Return a named temporary file in UPLOAD_FOLDER for each uploaded file.
+
+        The file is deleted when the request closes it. On Windows,
+        delete-on-close files cannot be linked, so the default (spooled)
+        stream is kept.
+        """
+        if os.name == "nt":
+            return super()._get_file_stream(
+                total_content_length, content_type, filename, content_length
+            )
+        return tempfile.NamedTemporaryFile(
+            "wb+", dir=current_app.config["UPLOAD_FOLDER"], prefix=".upload-"
+        )
+
+
+def file_mode(directory: Path) -> int:
+    """
+    Return the mode for an upload stored in directory.
+
+    The spool file from tempfile is 0600, but nginx (X_ACCEL_REDIRECT) needs
+    group read on stored uploads. The directory's permission bits without
+    the execute bits give what open() creates there under the umask the
+    directory was made with, without setting the process-wide umask to
+    read it.
+
+    Args:
+        directory: Directory the upload is stored in
+
+    Returns:
+        Permission bits, e.g. 0o644 for a 0755 directory
+    """
+    return stat.S_IMODE(os.stat(directory).st_mode) & 0o666
+
+
+def save_upload(file: FileStorage, path: Path) -> None:
+    """
+    Store an uploaded file at path.
+
+    If the upload was spooled by UploadRequest (same filesystem), the
+    spool file gets a second name (hard link) and no data is copied.
+    Otherwise the data is copied in 1 MB chunks to a temporary name and
+    renamed, so path never names a partially written file.
+
+    Args:
+        file: Uploaded file from request.files
+        path: Target path, must not exist yet
+
+    Example:
+        save_upload(request.files["file"], upload_folder / "abc.pdf")
+    """
+    spool_name = getattr(file.stream, "name", None)
+    if isinstance(spool_name, str):
+        file.stream.flush()
+        try:
+            os.link(spool_name, path)
+        except OSError as e:
+            logger.debug(f"Hard link not possible ({e}), copying upload")
+        else:
+            os.chmod(path, file_mode(path.parent))
+            return
+
+    tmp_path = path.with_name(f".tmp-{path.name}")
+    file.stream.seek(0)
+    try:
+        with open(tmp_path, "wb") as dst:
+            shutil.copyfileobj(file.stream, dst, 1024 * 1024)
+        os.replace(tmp_path, path)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
@@ -19,6 +19,11 @@ UUID_PATTERN = re.compile(
     re.IGNORECASE,
 )
 
+EMAIL_PATTERN = re.compile(r"^[^@\s]+@[^@\s]+\.[^@\s]+$")
+
+# Translation table for sanitize_filename: each dangerous character -> "_"
+_UNSAFE_FILENAME_CHARS = str.maketrans(dict.fromkeys('<>:"/\\|?*', "_"))
+
 
 def validate_doc_id(doc_id: str) -> tuple[bool, str | None]:
     """
@@ -35,6 +40,21 @@ def validate_doc_id(doc_id: str) -> tuple[bool, str | None]:
     return True, None
 
 
+def validate_email(email: str) -> tuple[bool, str | None]:
+    """
+    Validate the basic shape of an email address (local@domain.tld).
+
+    Args:
+        email: Email address to validate
+
+    Returns:
+        Tuple of (is_valid, error_message)
+    """
+    if not EMAIL_PATTERN.match(email):
+        return False, "Ungültige E-Mail-Adresse."
+    return True, None
+
+
 def allowed_file(filename: str, allowed_extensions: set) -> bool:
     """
     Check if filename has allowed extension.
@@ -129,12 +149,8 @@ def sanitize_filename(filename: str) -> str:
     # Get just the filename, not the path
     filename = Path(filename).name
 
-    # Remove dangerous characters
-    dangerous_chars = ["<", ">", ":", '"', "/", "\\", "|", "?", "*"]
-    for char in dangerous_chars:
-        filename = filename.replace(char, "_")
-
-    return filename
+    # Replace dangerous characters in one pass
+    return filename.translate(_UNSAFE_FILENAME_CHARS)
 
 
 def validate_page_number(page_number: int, max_pages: int) -> tuple[bool, str | None]:
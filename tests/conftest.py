@@ -19,6 +19,8 @@ from pdf_annotator.models.database import DatabaseManager
 def reset_db_singleton():
     """Reset DatabaseManager singleton between tests."""
     yield
+    if DatabaseManager._instance is not None:
+        DatabaseManager._instance.close()
     DatabaseManager._instance = None
     DatabaseManager._db_path = None
 
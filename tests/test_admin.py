@@ -19,6 +19,13 @@ class TestAdminRoutes:
         response = logged_in_client.get("/admin/")
         assert response.status_code == 403
 
+    def test_admin_actions_require_admin(self, app, logged_in_client, db, user):
+        """The blueprint-wide guard also covers the user management actions."""
+        response = logged_in_client.post(f"/admin/user/{user}/toggle_admin")
+        assert response.status_code == 403
+        with app.app_context():
+            assert db.get_user_by_id(user)["is_admin"] == 0
+
     def test_admin_page_visible_for_admin(self, admin_client):
         """Admin users should see the admin panel."""
         response = admin_client.get("/admin/")
@@ -1,5 +1,5 @@
 """
-Tests for authentication routes, focused on the change-password feature.
+Tests for authentication routes (change password, registration).
 """
 
 from werkzeug.security import check_password_hash
@@ -73,3 +73,47 @@ class TestChangePassword:
             },
         )
         assert response.status_code == 400
+
+
+class TestRegister:
+    """Test the registration route."""
+
+    def _register(self, client, username, email):
+        return client.post(
+            "/auth/register",
+            data={
+                "username": username,
+                "email": email,
+                "password": "password123",
+                "password_confirm": "password123",
+            },
+        )
+
+    def test_first_user_is_admin(self, app, client):
+        response = self._register(client, "first", "first@example.com")
+        assert response.status_code == 302
+
+        db = DatabaseManager()
+        with app.app_context():
+            assert db.get_user_by_username("first")["is_admin"] == 1
+
+    def test_second_user_is_not_admin(self, app, client, user):
+        response = self._register(client, "second", "second@example.com")
+        assert response.status_code == 302
+
+        db = DatabaseManager()
+        with app.app_context():
+            assert db.get_user_by_username("second")["is_admin"] == 0
+
+    def test_duplicate_username_rejected(self, app, client, user, monkeypatch):
+        def no_hash(password):
+            raise AssertionError("password hashed for a taken username")
+
+        monkeypatch.setattr("pdf_annotator.routes.auth.generate_password_hash", no_hash)
+        response = self._register(client, "testuser", "other@example.com")
+        assert response.status_code == 409
+        assert "Benutzername bereits vergeben" in response.get_data(as_text=True)
+
+    def test_duplicate_email_rejected(self, app, client, user):
+        response = self._register(client, "other", "test@example.com")
+        assert response.status_code == 409
@@ -4,6 +4,13 @@ Unit tests for DatabaseManager.
 Tests CRUD operations, annotations, cascade delete, metadata, and edge cases.
 """
 
+import sqlite3
+import threading
+
+import pytest
+
+from pdf_annotator.models.database import DatabaseManager
+
 
 class TestCreateDocument:
     """Test document creation."""
@@ -134,6 +141,56 @@ class TestAnnotations:
         ann = db.get_annotation(doc_id, 1)
         assert ann["note_text"] == "Updated version"
 
+    def test_upsert_unchanged_text_skips_write(self, db):
+        doc_id = db.create_document(
+            user_id=db.test_user_id,
+            filename="test.pdf",
+            file_path="/path/test.pdf",
+            page_count=2,
+        )
+        db.upsert_annotation(doc_id, 1, "Same")
+        with db.get_connection() as conn:
+            before = conn.total_changes
+        db.upsert_annotation(doc_id, 1, "Same")
+        with db.get_connection() as conn:
+            assert conn.total_changes == before
+
+    def test_upsert_returns_updated_at(self, db):
+        doc_id = db.create_document(
+            user_id=db.test_user_id,
+            filename="test.pdf",
+            file_path="/path/test.pdf",
+            page_count=2,
+        )
+        updated_at = db.upsert_annotation(doc_id, 1, "Note")
+        assert updated_at == str(db.get_annotation(doc_id, 1)["updated_at"])
+        # Unchanged text returns no row from RETURNING, the stored value is used
+        assert db.upsert_annotation(doc_id, 1, "Note") == updated_at
+
+    def test_upsert_annotations_batch(self, db):
+        doc_id = db.create_document(
+            user_id=db.test_user_id,
+            filename="test.pdf",
+            file_path="/path/test.pdf",
+            page_count=3,
+        )
+        db.upsert_annotation(doc_id, 2, "Old")
+        db.upsert_annotations(doc_id, [(1, "One"), (2, "Two"), (3, "Three")])
+        notes = [a["note_text"] for a in db.get_all_annotations(doc_id)]
+        assert notes == ["One", "Two", "Three"]
+
+    def test_get_last_edited(self, db):
+        doc_id = db.create_document(
+            user_id=db.test_user_id,
+            filename="test.pdf",
+            file_path="/path/test.pdf",
+            page_count=2,
+        )
+        assert db.get_last_edited(doc_id) is None
+        db.upsert_annotation(doc_id, 1, "Note")
+        ann = db.get_annotation(doc_id, 1)
+        assert db.get_last_edited(doc_id) == ann["updated_at"]
+
     def test_get_annotation_nonexistent_returns_none(self, db):
         doc_id = db.create_document(
             user_id=db.test_user_id,
@@ -144,6 +201,30 @@ class TestAnnotations:
         ann = db.get_annotation(doc_id, 99)
         assert ann is None
 
+    def test_get_annotation_with_doc_check(self, db):
+        doc_id = db.create_document(
+            user_id=db.test_user_id,
+            filename="test.pdf",
+            file_path="/path/test.pdf",
+            page_count=2,
+        )
+        db.upsert_annotation(doc_id, 1, "Note")
+        page = db.get_annotation_with_doc_check(doc_id, 1)
+        assert page["user_id"] == db.test_user_id
+        assert page["file_path"] == "/path/test.pdf"
+        assert page["page_count"] == 2
+        assert page["note_text"] == "Note"
+        assert page["updated_at"] is not None
+
+        # Document row without annotation for the page
+        page = db.get_annotation_with_doc_check(doc_id, 2)
+        assert page["page_count"] == 2
+        assert page["note_text"] is None
+        assert page["updated_at"] is None
+
+    def test_get_annotation_with_doc_check_missing_doc(self, db):
+        assert db.get_annotation_with_doc_check("nonexistent", 1) is None
+
     def test_get_all_annotations_sorted_by_page(self, db):
         doc_id = db.create_document(
             user_id=db.test_user_id,
@@ -171,6 +252,63 @@ class TestAnnotations:
         annotations = db.get_all_annotations(doc_id)
         assert annotations == []
 
+    def test_get_annotations_by_document(self, db, monkeypatch):
+        monkeypatch.setattr("pdf_annotator.models.database._MAX_IN_PARAMS", 2)
+        doc_ids = [
+            db.create_document(
+                user_id=db.test_user_id,
+                filename=f"test{i}.pdf",
+                file_path=f"/path/test{i}.pdf",
+                page_count=2,
+            )
+            for i in range(3)
+        ]
+        db.upsert_annotation(doc_ids[0], 2, "A2")
+        db.upsert_annotation(doc_ids[0], 1, "A1")
+        db.upsert_annotation(doc_ids[2], 1, "C1")
+
+        by_doc = db.get_annotations_by_document(doc_ids)
+        assert set(by_doc) == {doc_ids[0], doc_ids[2]}
+        assert [a["note_text"] for a in by_doc[doc_ids[0]]] == ["A1", "A2"]
+        assert [a["note_text"] for a in by_doc[doc_ids[2]]] == ["C1"]
+        assert db.get_annotations_by_document([]) == {}
+
+    def test_iter_annotations_sorted_by_page(self, db):
+        doc_id = db.create_document(
+            user_id=db.test_user_id,
+            filename="test.pdf",
+            file_path="/path/test.pdf",
+            page_count=2,
+        )
+        db.upsert_annotation(doc_id, 2, "Page 2")
+        db.upsert_annotation(doc_id, 1, "Page 1")
+
+        rows = db.iter_annotations(doc_id)
+        assert not isinstance(rows, list)
+        assert [(r["page_number"], r["note_text"]) for r in rows] == [
+            (1, "Page 1"),
+            (2, "Page 2"),
+        ]
+
+    def test_abandoned_iter_annotations_keeps_commits_working(self, db):
+        doc_id = db.create_document(
+            user_id=db.test_user_id,
+            filename="test.pdf",
+            file_path="/path/test.pdf",
+            page_count=2,
+        )
+        db.upsert_annotations(doc_id, [(1, "a"), (2, "b")])
+        next(db.iter_annotations(doc_id))
+
+        db.upsert_annotation(doc_id, 1, "changed")
+        other = sqlite3.connect(db._db_path)
+        row = other.execute(
+            "SELECT note_text FROM annotations WHERE doc_id = ? AND page_number = 1",
+            (doc_id,),
+        ).fetchone()
+        other.close()
+        assert row[0] == "changed"
+
 
 class TestUpdateMetadata:
     """Test metadata updates."""
@@ -274,3 +412,182 @@ class TestGetAllDocuments:
         docs = db.get_all_documents(user_id=db.test_user_id)
         assert len(docs) == 1
         assert docs[0]["last_edited"] is not None
+
+    def test_get_export_summary(self, db):
+        for name, notes in (("a.pdf", ["One", "Two"]), ("b.pdf", [])):
+            doc_id = db.create_document(
+                user_id=db.test_user_id,
+                filename=name,
+                file_path=f"/path/{name}",
+                page_count=2,
+            )
+            for page, note in enumerate(notes, 1):
+                db.upsert_annotation(doc_id, page, note)
+
+        summary = db.get_export_summary(db.test_user_id)
+        assert summary["document_count"] == 2
+        assert summary["annotation_count"] == 2
+        assert sorted(summary["file_paths"]) == ["/path/a.pdf", "/path/b.pdf"]
+        assert db.get_export_summary("other-user")["document_count"] == 0
+
+
+class TestExecPragmas:
+    """Test PRAGMA configuration."""
+
+    def test_persistent_pragma_applied(self, db):
+        db.exec_pragmas(["PRAGMA journal_mode=WAL"])
+        with db.get_connection() as conn:
+            assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+
+    def test_connection_pragmas_replayed(self, db):
+        db.exec_pragmas(["PRAGMA synchronous=OFF", "PRAGMA busy_timeout=1234"])
+        with db.get_connection() as conn:
+            assert conn.execute("PRAGMA synchronous").fetchone()[0] == 0
+            assert conn.execute("PRAGMA busy_timeout").fetchone()[0] == 1234
+
+
+class TestSchemaMigration:
+    """Test column migration of databases created by older versions."""
+
+    def test_missing_columns_added(self, tmp_path):
+        db_path = tmp_path / "old.db"
+        conn = sqlite3.connect(db_path)
+        conn.execute(
+            "CREATE TABLE users (id TEXT PRIMARY KEY, username TEXT NOT NULL UNIQUE,"
+            " email TEXT NOT NULL UNIQUE, password_hash TEXT NOT NULL)"
+        )
+        conn.execute(
+            "CREATE TABLE documents (id TEXT PRIMARY KEY,"
+            " original_filename TEXT NOT NULL, file_path TEXT NOT NULL,"
+            " page_count INTEGER NOT NULL)"
+        )
+        conn.close()
+
+        DatabaseManager(db_path).init_db()
+
+        conn = sqlite3.connect(db_path)
+        doc_cols = {row[1] for row in conn.execute("PRAGMA table_info(documents)")}
+        user_cols = {row[1] for row in conn.execute("PRAGMA table_info(users)")}
+        conn.close()
+        assert {"first_name", "subject", "user_id"} <= doc_cols
+        assert {"is_admin", "theme"} <= user_cols
+
+    def test_timestamp_trigger_dropped(self, db):
+        with db.get_connection() as conn:
+            conn.execute(
+                "CREATE TRIGGER update_annotation_timestamp AFTER UPDATE ON "
+                "annotations BEGIN SELECT 1; END"
+            )
+        db.init_db()
+        with db.get_connection() as conn:
+            row = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'trigger'"
+            ).fetchone()
+        assert row is None
+
+    def test_init_db_idempotent(self, db):
+        db.init_db()
+        with db.get_connection() as conn:
+            cols = [row[1] for row in conn.execute("PRAGMA table_info(documents)")]
+        assert cols.count("subject") == 1
+
+    def test_username_lookup_uses_index(self, db):
+        # UNIQUE(username) creates the index the login lookup relies on
+        with db.get_connection() as conn:
+            plan = conn.execute(
+                "EXPLAIN QUERY PLAN SELECT * FROM users WHERE username = ?",
+                ("dbtest",),
+            ).fetchall()
+        assert any("USING INDEX" in row["detail"] for row in plan)
+
+
+class TestConnectionCache:
+    """Test per-thread connection reuse and transaction handling."""
+
+    def test_connection_reused_in_thread(self, db):
+        with db.get_connection() as first:
+            pass
+        with db.get_connection() as second:
+            pass
+        assert first is second
+
+    def test_connection_per_thread(self, db):
+        with db.get_connection() as main_conn:
+            pass
+        other = []
+
+        def worker():
+            with db.get_connection() as conn:
+                other.append(conn)
+            db.close()
+
+        thread = threading.Thread(target=worker)
+        thread.start()
+        thread.join()
+        assert other[0] is not main_conn
+
+    def test_exception_rolls_back(self, db):
+        doc_id = db.create_document(db.test_user_id, "a.pdf", "/tmp/a.pdf", 1)
+        with pytest.raises(RuntimeError):
+            with db.get_connection() as conn:
+                conn.execute("DELETE FROM documents WHERE id = ?", (doc_id,))
+                raise RuntimeError
+        assert db.get_document(doc_id) is not None
+
+    def test_nested_block_joins_outer_transaction(self, db):
+        doc_id = db.create_document(db.test_user_id, "a.pdf", "/tmp/a.pdf", 1)
+        with pytest.raises(RuntimeError):
+            with db.get_connection():
+                db.upsert_annotation(doc_id, 1, "note")
+                raise RuntimeError
+        assert db.get_annotation(doc_id, 1) is None
+
+
+class TestLastAdminGuard:
+    """Test that the last admin cannot be removed at the database level."""
+
+    def test_user_with_admin_count(self, db):
+        db.set_user_admin(db.test_user_id, True)
+        user = db.get_user_with_admin_count(db.test_user_id)
+        assert user["username"] == "dbtest"
+        assert user["admin_count"] == 1
+
+    def test_user_with_admin_count_missing_user(self, db):
+        assert db.get_user_with_admin_count("missing") is None
+
+    def test_last_admin_cannot_be_removed(self, db):
+        db.set_user_admin(db.test_user_id, True)
+        assert db.set_user_admin(db.test_user_id, False) is False
+        assert db.set_user_active(db.test_user_id, False) is False
+        assert db.delete_user(db.test_user_id) is False
+        assert db.get_user_by_id(db.test_user_id)["is_admin"] == 1
+
+    def test_admin_removable_when_another_exists(self, db):
+        other = db.create_user("other", "other@example.com", "hash")
+        db.set_user_admin(db.test_user_id, True)
+        db.set_user_admin(other, True)
+        assert db.set_user_admin(db.test_user_id, False) is True
+
+
+class TestRegisterUser:
+    """Test atomic user registration."""
+
+    def test_first_user_becomes_admin(self, tmp_path):
+        manager = DatabaseManager(tmp_path / "empty.db")
+        manager.init_db()
+        user_id, is_admin = manager.register_user("first", "first@example.com", "h")
+        assert is_admin is True
+        assert manager.get_user_by_id(user_id)["is_admin"] == 1
+
+    def test_later_user_is_not_admin(self, db):
+        user_id, is_admin = db.register_user("second", "second@example.com", "h")
+        assert is_admin is False
+        assert db.get_user_by_id(user_id)["is_admin"] == 0
+
+    def test_duplicate_username_returns_none(self, db):
+        assert db.register_user("dbtest", "new@example.com", "h") is None
+        assert db.count_users() == 1
+
+    def test_duplicate_email_raises(self, db):
+        with pytest.raises(sqlite3.IntegrityError):
+            db.register_user("newname", "dbtest@example.com", "h")
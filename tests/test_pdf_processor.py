@@ -4,15 +4,25 @@ Unit tests for PDF processor service.
 Tests PDF validation, page counting, rendering, and cache.
 """
 
+import os
+import shutil
+import threading
+import time
+
+import fitz
 import pytest
 
+from pdf_annotator.services import pdf_processor
 from pdf_annotator.services.pdf_processor import (
+    clear_page_image_cache,
     clear_render_cache,
     clear_text_layout_cache,
     get_cache_info,
+    get_cached_page_image,
     get_page_count,
     get_page_dimensions,
     get_page_text_layout,
+    prune_page_image_cache,
     render_page_to_image,
     validate_pdf,
 )
@@ -53,6 +63,15 @@ class TestGetPageCount:
         with pytest.raises(ValueError):
             get_page_count(invalid)
 
+    def test_image_renamed_to_pdf_raises(self, sample_pdf, tmp_path):
+        with fitz.open(sample_pdf) as doc:
+            png = doc[0].get_pixmap().tobytes("png")
+        renamed = tmp_path / "image.pdf"
+        renamed.write_bytes(png)
+        with pytest.raises(ValueError):
+            get_page_count(renamed)
+        assert validate_pdf(renamed) is False
+
 
 class TestRenderPageToImage:
     """Test page rendering."""
@@ -100,6 +119,104 @@ class TestCache:
         assert "maxsize" in info
 
 
+class TestPageImageCache:
+    """Test the on-disk page image cache."""
+
+    def test_renders_once_to_png_file(self, sample_pdf, tmp_path):
+        cache_dir = tmp_path / "cache" / "doc"
+        first = get_cached_page_image(str(sample_pdf), 1, 72, cache_dir)
+        assert first is not None
+        assert first.read_bytes()[:4] == b"\x89PNG"
+        assert get_cached_page_image(str(sample_pdf), 1, 72, cache_dir) == first
+        assert [p.name for p in cache_dir.iterdir()] == [first.name]
+
+    def test_changed_pdf_gets_new_image(self, sample_pdf, tmp_path):
+        cache_dir = tmp_path / "cache" / "doc"
+        first = get_cached_page_image(str(sample_pdf), 1, 72, cache_dir)
+        stat = sample_pdf.stat()
+        os.utime(sample_pdf, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+        second = get_cached_page_image(str(sample_pdf), 1, 72, cache_dir)
+        assert second is not None
+        assert second != first
+
+    def test_replaced_pdf_without_cache_clear(
+        self, sample_pdf, sample_pdf_3pages, tmp_path
+    ):
+        """Another worker's in-memory render of the old file is not reused."""
+        cache_dir = tmp_path / "cache" / "doc"
+        clear_render_cache()
+        old = render_page_to_image(str(sample_pdf), 1, dpi=72)
+
+        stat = sample_pdf.stat()
+        shutil.copyfile(sample_pdf_3pages, sample_pdf)
+        os.utime(sample_pdf, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+
+        image = get_cached_page_image(str(sample_pdf), 1, 72, cache_dir)
+        assert image is not None
+        assert image.read_bytes() != old
+        assert render_page_to_image(str(sample_pdf), 1, dpi=72) == image.read_bytes()
+
+    def test_cache_hit_bumps_mtime(self, sample_pdf, tmp_path):
+        cache_dir = tmp_path / "cache" / "doc"
+        image = get_cached_page_image(str(sample_pdf), 1, 72, cache_dir)
+        os.utime(image, (1000, 1000))
+        assert get_cached_page_image(str(sample_pdf), 1, 72, cache_dir) == image
+        assert image.stat().st_mtime > 1000
+
+    def test_concurrent_requests_render_once(self, sample_pdf, tmp_path, monkeypatch):
+        cache_dir = tmp_path / "cache" / "doc"
+        calls = []
+
+        def slow_render(file_path, page_num, dpi, mtime_ns):
+            calls.append(page_num)
+            time.sleep(0.2)
+            return b"\x89PNG fake"
+
+        monkeypatch.setattr(pdf_processor, "render_page_to_image", slow_render)
+        results = []
+        threads = [
+            threading.Thread(
+                target=lambda: results.append(
+                    get_cached_page_image(str(sample_pdf), 1, 72, cache_dir)
+                )
+            )
+            for _ in range(4)
+        ]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        assert calls == [1]
+        assert len(set(results)) == 1 and results[0] is not None
+        assert not list((tmp_path / "cache").glob("*.lock"))
+
+    def test_invalid_page_returns_none(self, sample_pdf, tmp_path):
+        cache_dir = tmp_path / "cache" / "doc"
+        assert get_cached_page_image(str(sample_pdf), 99, 72, cache_dir) is None
+        assert not cache_dir.exists()
+
+    def test_clear_page_image_cache(self, sample_pdf, tmp_path):
+        cache_dir = tmp_path / "cache" / "doc"
+        get_cached_page_image(str(sample_pdf), 1, 72, cache_dir)
+        clear_page_image_cache(cache_dir)
+        assert not cache_dir.exists()
+
+    def test_prune_removes_least_recently_used(self, tmp_path):
+        files = []
+        for i, doc in enumerate(["doc-a", "doc-b", "doc-b"]):
+            path = tmp_path / "cache" / doc / f"p{i + 1}-72dpi-1.png"
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_bytes(b"x" * 100)
+            os.utime(path, (1000, 1000 + i))
+            files.append(path)
+
+        assert prune_page_image_cache(tmp_path, 250) == 1
+        assert [p.exists() for p in files] == [False, True, True]
+        assert prune_page_image_cache(tmp_path, 250) == 0
+        assert prune_page_image_cache(tmp_path / "missing", 0) == 0
+
+
 class TestGetPageTextLayout:
     """Test word/bbox text extraction for the selectable text overlay."""
 
@@ -133,4 +250,4 @@ class TestGetPageTextLayout:
     def test_clear_text_layout_cache(self, sample_pdf):
         get_page_text_layout(str(sample_pdf), 1)
         clear_text_layout_cache()
-        assert get_page_text_layout.cache_info().currsize == 0
+        assert pdf_processor._page_text_layout_cached.cache_info().currsize == 0
@@ -4,9 +4,24 @@ Unit tests for Flask routes.
 Tests upload, viewer, annotation, metadata, delete, and export endpoints.
 """
 
+import io
 import json
+import os
+import re
+import shutil
+import stat
+import time
+import zipfile
 from pathlib import Path
 
+import pytest
+
+from pdf_annotator.models.database import DatabaseManager
+from pdf_annotator.routes import upload as upload_routes
+from pdf_annotator.routes.export import EXPORT_MAX_AGE_SECONDS, remove_old_exports
+from pdf_annotator.services.data_manager import DataManager
+from pdf_annotator.utils.uploads import file_mode
+
 
 class TestUploadRoutes:
     """Test upload endpoints."""
@@ -34,6 +49,61 @@ class TestUploadRoutes:
         assert "doc_id" in result
         assert "redirect_url" in result
 
+    def test_upload_stored_without_spool_leftovers(
+        self, app, logged_in_client, sample_pdf
+    ):
+        with open(sample_pdf, "rb") as f:
+            response = logged_in_client.post(
+                "/upload",
+                data={"file": (f, "test.pdf")},
+                content_type="multipart/form-data",
+                headers={"Accept": "application/json"},
+            )
+        assert response.status_code == 200
+
+        stored = list(Path(app.config["UPLOAD_FOLDER"]).iterdir())
+        assert len(stored) == 1
+        assert stored[0].suffix == ".pdf"
+        assert stored[0].read_bytes() == sample_pdf.read_bytes()
+        assert stored[0].stat().st_mode & 0o777 == file_mode(
+            Path(app.config["UPLOAD_FOLDER"])
+        )
+
+    def test_upload_mode_follows_upload_folder(self, app, logged_in_client, sample_pdf):
+        upload_folder = Path(app.config["UPLOAD_FOLDER"])
+        upload_folder.chmod(0o2750)
+        with open(sample_pdf, "rb") as f:
+            response = logged_in_client.post(
+                "/upload",
+                data={"file": (f, "test.pdf")},
+                content_type="multipart/form-data",
+                headers={"Accept": "application/json"},
+            )
+        assert response.status_code == 200
+
+        (stored,) = upload_folder.glob("*.pdf")
+        assert stat.S_IMODE(stored.stat().st_mode) == 0o640
+
+    def test_upload_copied_when_link_fails(
+        self, app, logged_in_client, sample_pdf, monkeypatch
+    ):
+        def no_link(src, dst):
+            raise OSError("cross-device link")
+
+        monkeypatch.setattr(os, "link", no_link)
+        with open(sample_pdf, "rb") as f:
+            response = logged_in_client.post(
+                "/upload",
+                data={"file": (f, "test.pdf")},
+                content_type="multipart/form-data",
+                headers={"Accept": "application/json"},
+            )
+        assert response.status_code == 200
+
+        stored = list(Path(app.config["UPLOAD_FOLDER"]).iterdir())
+        assert [p.suffix for p in stored] == [".pdf"]
+        assert stored[0].read_bytes() == sample_pdf.read_bytes()
+
     def test_upload_without_file(self, logged_in_client):
         response = logged_in_client.post(
             "/upload",
@@ -83,6 +153,15 @@ class TestDeleteDocument:
         result = response.get_json()
         assert result["success"] is True
 
+    def test_delete_removes_page_image_cache(self, app, logged_in_client, uploaded_pdf):
+        logged_in_client.get(f"/viewer/api/page/{uploaded_pdf}/1")
+        cache_dir = Path(app.config["UPLOAD_FOLDER"]) / "cache" / uploaded_pdf
+        assert cache_dir.exists()
+
+        response = logged_in_client.delete(f"/delete/{uploaded_pdf}")
+        assert response.status_code == 200
+        assert not cache_dir.exists()
+
     def test_delete_invalid_doc_id(self, logged_in_client):
         response = logged_in_client.delete("/delete/not-a-uuid")
         assert response.status_code == 400
@@ -121,6 +200,95 @@ class TestPageImageApi:
         # PNG magic bytes
         assert response.data[:4] == b"\x89PNG"
 
+    def test_get_page_image_cached_with_etag(self, app, logged_in_client, uploaded_pdf):
+        first = logged_in_client.get(f"/viewer/api/page/{uploaded_pdf}/1")
+        assert first.status_code == 200
+        assert first.headers["Cache-Control"] == "private, max-age=300"
+        cache_dir = Path(app.config["UPLOAD_FOLDER"]) / "cache" / uploaded_pdf
+        assert len(list(cache_dir.glob("p1-*.png"))) == 1
+
+        second = logged_in_client.get(
+            f"/viewer/api/page/{uploaded_pdf}/1",
+            headers={"If-None-Match": first.headers["ETag"]},
+        )
+        assert second.status_code == 304
+
+    def test_get_page_image_x_accel(
+        self, app, logged_in_client, uploaded_pdf, monkeypatch
+    ):
+        monkeypatch.setitem(app.config, "X_ACCEL_REDIRECT", True)
+        response = logged_in_client.get(f"/viewer/api/page/{uploaded_pdf}/1")
+        assert response.status_code == 200
+        assert response.headers["X-Accel-Redirect"].startswith(
+            f"/_protected/uploads/cache/{uploaded_pdf}/p1-"
+        )
+        assert response.mimetype == "image/png"
+        assert response.headers["Content-Disposition"].startswith("inline")
+        assert response.headers["Cache-Control"] == "private, max-age=300"
+        assert response.data == b""
+
+    def test_get_page_image_cache_disabled(
+        self, app, logged_in_client, uploaded_pdf, monkeypatch
+    ):
+        monkeypatch.setitem(app.config, "PAGE_IMAGE_CACHE", False)
+        response = logged_in_client.get(f"/viewer/api/page/{uploaded_pdf}/1")
+        assert response.status_code == 200
+        assert response.data[:4] == b"\x89PNG"
+        assert not (Path(app.config["UPLOAD_FOLDER"]) / "cache").exists()
+
+    def test_get_page_image_cache_disabled_etag(
+        self, app, logged_in_client, uploaded_pdf, monkeypatch
+    ):
+        monkeypatch.setitem(app.config, "PAGE_IMAGE_CACHE", False)
+        first = logged_in_client.get(f"/viewer/api/page/{uploaded_pdf}/1")
+        assert first.headers["ETag"]
+
+        second = logged_in_client.get(
+            f"/viewer/api/page/{uploaded_pdf}/1",
+            headers={"If-None-Match": first.headers["ETag"]},
+        )
+        assert second.status_code == 304
+        assert second.data == b""
+
+    def test_get_page_image_versioned_url_immutable(
+        self, app, logged_in_client, uploaded_pdf
+    ):
+        page = logged_in_client.get(f"/viewer/{uploaded_pdf}").data.decode()
+        version = re.search(r'data-page-version="(\d+)"', page).group(1)
+
+        current = logged_in_client.get(f"/viewer/api/page/{uploaded_pdf}/1?v={version}")
+        assert current.headers["Cache-Control"] == ("private, max-age=86400, immutable")
+        stale = logged_in_client.get(f"/viewer/api/page/{uploaded_pdf}/1?v=1")
+        assert stale.headers["Cache-Control"] == "private, max-age=300"
+
+    def test_get_page_image_versioned_after_replace_without_cache_clear(
+        self, app, monkeypatch, logged_in_client, uploaded_pdf, sample_pdf_3pages
+    ):
+        # Another worker replaced the PDF: this process never ran
+        # clear_render_cache(), yet the new ?v= URL must get the new page
+        monkeypatch.setitem(app.config, "PAGE_IMAGE_CACHE", False)
+        pdf_path = Path(app.config["UPLOAD_FOLDER"]) / "test.pdf"
+        old_version = pdf_path.stat().st_mtime_ns
+        old = logged_in_client.get(f"/viewer/api/page/{uploaded_pdf}/1?v={old_version}")
+        old_text = logged_in_client.get(f"/viewer/api/page/{uploaded_pdf}/1/text")
+
+        shutil.copyfile(sample_pdf_3pages, pdf_path)
+        new_version = old_version + 1
+        os.utime(pdf_path, ns=(new_version, new_version))
+
+        new = logged_in_client.get(f"/viewer/api/page/{uploaded_pdf}/1?v={new_version}")
+        assert new.status_code == 200
+        assert new.headers["Cache-Control"] == "private, max-age=86400, immutable"
+        assert new.data != old.data
+        assert new.headers["ETag"] != old.headers["ETag"]
+
+        new_text = logged_in_client.get(f"/viewer/api/page/{uploaded_pdf}/1/text")
+        words = [
+            w["text"] for line in new_text.get_json()["lines"] for w in line["words"]
+        ]
+        assert "Seite" in words
+        assert new_text.get_json() != old_text.get_json()
+
     def test_get_page_image_invalid_page(self, app, logged_in_client, uploaded_pdf):
         response = logged_in_client.get(f"/viewer/api/page/{uploaded_pdf}/99")
         assert response.status_code == 400
@@ -173,11 +341,13 @@ class TestAnnotationApi:
         )
         assert response.status_code == 200
         assert response.get_json()["success"] is True
+        updated_at = response.get_json()["updated_at"]
 
         # Verify
         response = logged_in_client.get(f"/viewer/api/annotation/{uploaded_pdf}/1")
         data = response.get_json()
         assert data["note_text"] == "Test note"
+        assert data["updated_at"] == updated_at
 
     def test_save_annotation_no_data(self, app, logged_in_client, uploaded_pdf):
         response = logged_in_client.post(
@@ -225,6 +395,16 @@ class TestMetadataApi:
         )
         assert response.status_code == 400
 
+    def test_update_metadata_too_long(self, app, logged_in_client, uploaded_pdf):
+        limit = app.config["MAX_TITLE_LENGTH"]
+        response = logged_in_client.post(
+            f"/viewer/api/metadata/{uploaded_pdf}",
+            data=json.dumps({"first_name": "Max", "title": "x" * (limit + 1)}),
+            content_type="application/json",
+        )
+        assert response.status_code == 400
+        assert response.get_json()["error"] == f"Titel zu lang (max. {limit} Zeichen)"
+
     def test_update_metadata_invalid_doc(self, logged_in_client):
         response = logged_in_client.post(
             "/viewer/api/metadata/not-a-uuid",
@@ -234,6 +414,41 @@ class TestMetadataApi:
         assert response.status_code == 400
 
 
+class TestReplacePdf:
+    """Test PDF replacement API."""
+
+    def test_replace_pdf(
+        self, app, logged_in_client, uploaded_pdf, sample_pdf_3pages, db
+    ):
+        response = logged_in_client.post(
+            f"/viewer/api/replace/{uploaded_pdf}",
+            data={"file": (open(sample_pdf_3pages, "rb"), "new.pdf")},
+            content_type="multipart/form-data",
+        )
+        assert response.status_code == 200
+        assert response.get_json()["page_count"] == 3
+        file_path = Path(db.get_document(uploaded_pdf)["file_path"])
+        assert file_path.read_bytes() == sample_pdf_3pages.read_bytes()
+        assert stat.S_IMODE(file_path.stat().st_mode) == file_mode(file_path.parent)
+        assert not list(file_path.parent.glob(".tmp-*"))
+
+    def test_replace_with_invalid_pdf_keeps_document(
+        self, app, logged_in_client, uploaded_pdf, db
+    ):
+        file_path = Path(db.get_document(uploaded_pdf)["file_path"])
+        original = file_path.read_bytes()
+
+        response = logged_in_client.post(
+            f"/viewer/api/replace/{uploaded_pdf}",
+            data={"file": (io.BytesIO(b"not a pdf"), "broken.pdf")},
+            content_type="multipart/form-data",
+        )
+        assert response.status_code == 400
+        assert file_path.read_bytes() == original
+        assert db.get_document(uploaded_pdf)["page_count"] == 2
+        assert not list(file_path.parent.glob(".tmp-*"))
+
+
 class TestDeletePage:
     """Test page deletion API."""
 
@@ -244,6 +459,7 @@ class TestDeletePage:
         data = response.get_json()
         assert data["success"] is True
         assert data["page_count"] == 2
+        assert data["page_version"]
 
     def test_delete_last_remaining_page_rejected(
         self, app, logged_in_client, tmp_path, user, db
@@ -330,17 +546,137 @@ class TestExportRoutes:
         assert response.status_code == 200
         assert response.content_type == "application/pdf"
 
+    def test_export_original_pdf_not_modified(
+        self, app, logged_in_client, uploaded_pdf
+    ):
+        first = logged_in_client.get(f"/export/original/{uploaded_pdf}")
+        assert first.headers["ETag"]
+        assert "no-cache" in first.headers["Cache-Control"]
+
+        second = logged_in_client.get(
+            f"/export/original/{uploaded_pdf}",
+            headers={"If-None-Match": first.headers["ETag"]},
+        )
+        assert second.status_code == 304
+        assert second.data == b""
+
+    def test_export_original_pdf_x_accel(
+        self, app, logged_in_client, uploaded_pdf, monkeypatch
+    ):
+        monkeypatch.setitem(app.config, "X_ACCEL_REDIRECT", True)
+        response = logged_in_client.get(f"/export/original/{uploaded_pdf}")
+        assert response.status_code == 200
+        assert response.headers["X-Accel-Redirect"] == "/_protected/uploads/test.pdf"
+        assert "X-Sendfile" not in response.headers
+        assert "attachment" in response.headers["Content-Disposition"]
+        assert response.data == b""
+
     def test_export_nonexistent_doc(self, logged_in_client):
         fake_uuid = "00000000-0000-0000-0000-000000000000"
         response = logged_in_client.post(f"/export/pdf/{fake_uuid}")
         assert response.status_code == 404
 
+    def test_export_data_streamed(self, app, logged_in_client, uploaded_pdf):
+        export_folder = Path(app.config["EXPORT_FOLDER"])
+        before = set(export_folder.iterdir())
+
+        response = logged_in_client.get("/export")
+        assert response.status_code == 200
+        assert response.is_streamed
+        assert response.mimetype == "application/zip"
+        assert "attachment" in response.headers["Content-Disposition"]
+
+        with zipfile.ZipFile(io.BytesIO(response.data)) as zf:
+            assert zf.namelist() == ["metadata.json", f"pdfs/{uploaded_pdf}.pdf"]
+            pdf_info = zf.getinfo(f"pdfs/{uploaded_pdf}.pdf")
+            assert pdf_info.compress_type == zipfile.ZIP_STORED
+            assert zf.read(pdf_info)[:5] == b"%PDF-"
+            metadata = json.loads(zf.read("metadata.json"))
+        assert metadata["version"] == "1.0"
+        assert metadata["documents"][0]["id"] == uploaded_pdf
+        # Nothing is written to disk
+        assert set(export_folder.iterdir()) == before
+
+    def test_export_data_reuses_document_rows(
+        self, app, logged_in_client, uploaded_pdf, monkeypatch
+    ):
+        def no_lookup(self, doc_id):
+            raise AssertionError("document fetched again")
+
+        monkeypatch.setattr(DatabaseManager, "get_document", no_lookup)
+        response = logged_in_client.get("/export")
+        assert response.status_code == 200
+        with zipfile.ZipFile(io.BytesIO(response.data)) as zf:
+            assert f"pdfs/{uploaded_pdf}.pdf" in zf.namelist()
+
+    def test_export_data_logs_streaming_errors(
+        self, app, logged_in_client, uploaded_pdf, monkeypatch
+    ):
+        def broken_export(self, doc_ids=None, documents=None):
+            yield b"PK"
+            raise OSError("disk gone")
+
+        errors = []
+        monkeypatch.setattr(DataManager, "iter_export_data", broken_export)
+        monkeypatch.setattr(
+            upload_routes.logger, "error", lambda msg, **kw: errors.append(msg)
+        )
+        response = logged_in_client.get("/export")
+        assert response.status_code == 200
+        with pytest.raises(OSError):
+            response.get_data()
+        assert errors == ["Export failed while streaming: disk gone"]
+
+    def test_import_data_from_upload_stream(self, app, logged_in_client, uploaded_pdf):
+        archive = logged_in_client.get("/export").data
+        upload_folder = Path(app.config["UPLOAD_FOLDER"])
+
+        response = logged_in_client.post(
+            "/import",
+            data={"file": (io.BytesIO(archive), "backup.zip")},
+            content_type="multipart/form-data",
+        )
+        assert response.status_code == 200
+        assert response.get_json()["documents_imported"] == 1
+        assert len(list(upload_folder.glob("*.pdf"))) == 2
+        assert not list(upload_folder.glob(".upload-*"))
+
+    def test_import_is_all_or_nothing(
+        self, app, logged_in_client, uploaded_pdf, db, user
+    ):
+        archive = logged_in_client.get("/export").data
+        upload_folder = Path(app.config["UPLOAD_FOLDER"])
+        broken = io.BytesIO()
+        with (
+            zipfile.ZipFile(io.BytesIO(archive)) as src,
+            zipfile.ZipFile(broken, "w") as dst,
+        ):
+            metadata = json.loads(src.read("metadata.json"))
+            good = metadata["documents"][0]
+            bad = {key: value for key, value in good.items() if key != "page_count"}
+            metadata["documents"].append(bad)
+            dst.writestr("metadata.json", json.dumps(metadata))
+            dst.writestr(
+                f"pdfs/{uploaded_pdf}.pdf", src.read(f"pdfs/{uploaded_pdf}.pdf")
+            )
+        broken.seek(0)
+
+        response = logged_in_client.post(
+            "/import",
+            data={"file": (broken, "backup.zip")},
+            content_type="multipart/form-data",
+        )
+        assert response.status_code == 500
+        assert len(db.get_all_documents(user)) == 1
+        assert len(list(upload_folder.glob("*.pdf"))) == 1
+
     def test_export_info(self, app, logged_in_client, uploaded_pdf):
         response = logged_in_client.get("/export/info")
         assert response.status_code == 200
         data = response.get_json()
-        assert "document_count" in data
+        assert data["document_count"] == 1
         assert "annotation_count" in data
+        assert data["estimated_size_mb"] >= 0
 
 
 class TestDesktopModeExports:
@@ -397,3 +733,23 @@ class TestDesktopModeExports:
         assert data["success"] is True
         assert Path(data["path"]).exists()
         assert Path(data["path"]).suffix == ".zip"
+
+
+class TestExportCleanup:
+    """Test removal of stale export files."""
+
+    def test_removes_only_old_files(self, tmp_path):
+        old_file = tmp_path / "old.pdf"
+        new_file = tmp_path / "new.pdf"
+        old_file.write_bytes(b"x")
+        new_file.write_bytes(b"x")
+        now = time.time()
+        os.utime(old_file, (now - EXPORT_MAX_AGE_SECONDS - 10,) * 2)
+
+        remove_old_exports(str(tmp_path), now)
+
+        assert not old_file.exists()
+        assert new_file.exists()
+
+    def test_missing_folder_ignored(self, tmp_path):
+        remove_old_exports(str(tmp_path / "missing"), time.time())
@@ -11,6 +11,7 @@ import pytest
 from pdf_annotator.utils.validators import (
     sanitize_filename,
     validate_ai_instruction,
+    validate_email,
     validate_file_path,
     validate_note_text,
     validate_search_query,
@@ -161,6 +162,22 @@ class TestValidateSearchQuery:
         assert "text" in error.lower()
 
 
+class TestValidateEmail:
+    """Test email format validation."""
+
+    @pytest.mark.parametrize("email", ["a@b.de", "john.doe@mail.example.com"])
+    def test_valid_email_accepted(self, email):
+        assert validate_email(email) == (True, None)
+
+    @pytest.mark.parametrize(
+        "email", ["plain", "a@b", "@b.de", "a@.de", "a@b.", "a b@c.de", "a@b@c.de"]
+    )
+    def test_invalid_email_rejected(self, email):
+        is_valid, error = validate_email(email)
+        assert is_valid is False
+        assert "E-Mail" in error
+
+
 class TestSanitizeFilename:
     """Test filename sanitization."""
 